@@ -0,0 +1,149 @@
+import asyncio
+import json
+from collections import deque
+from dataclasses import dataclass
+
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+
+class LaneRejected(Exception):
+
+    def __init__(self, lane: "Lane", status_code: int, reason: str):
+        super().__init__(reason)
+        self.lane = lane
+        self.status_code = status_code
+        self.reason = reason
+
+
+@dataclass
+class LaneStats:
+    name: str
+    max_concurrency: int
+    max_queue: int
+    active: int
+    queued: int
+    admitted: int
+    rejected_full: int
+    rejected_timeout: int
+
+
+class Lane:
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int,
+                 queue_timeout: float, retry_after: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            raise LaneRejected(self, 429, f"{self.name} queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # release() hands its slot straight to the waiter, so `active` is
+            # already accounted for when this returns.
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise LaneRejected(self, 503, f"{self.name} queue wait timed out") from None
+        except asyncio.CancelledError:
+            # The client went away; give back a slot that may have just been handed over.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> LaneStats:
+        return LaneStats(
+            name=self.name,
+            max_concurrency=self.max_concurrency,
+            max_queue=self.max_queue,
+            active=self.active,
+            queued=len(self._waiters),
+            admitted=self.admitted,
+            rejected_full=self.rejected_full,
+            rejected_timeout=self.rejected_timeout,
+        )
+
+
+class AdmissionController:
+
+    def __init__(self, interactive: Lane, bulk: Lane, bulk_paths: tuple[str, ...] = ("/api/calculate/bulk",),
+                 managed_prefix: str = "/api/"):
+        self.lanes = {INTERACTIVE: interactive, BULK: bulk}
+        self.bulk_paths = bulk_paths
+        self.managed_prefix = managed_prefix
+
+    def classify(self, path: str) -> Lane | None:
+        if path in self.bulk_paths:
+            return self.lanes[BULK]
+        if path.startswith(self.managed_prefix):
+            return self.lanes[INTERACTIVE]
+        return None
+
+    def snapshot(self) -> dict[str, LaneStats]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+
+class AdmissionMiddleware:
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        lane = self.controller.classify(scope["path"]) if scope["type"] == "http" else None
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await lane.acquire()
+        except LaneRejected as rejected:
+            await _send_rejection(send, rejected)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release()
+
+
+async def _send_rejection(send, rejected: LaneRejected) -> None:
+    body = json.dumps({"detail": rejected.reason, "lane": rejected.lane.name}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": rejected.status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(rejected.lane.retry_after).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import operator
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from pathlib import Path
+
+from . import calculations as logic
+from .calculations import Inputs, Result
+from .wire import pack_inputs
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Hits refresh their LRU timestamp at most this often, so reads rarely write.
+TOUCH_INTERVAL = 60.0
+# Writes are best-effort: wait this long for another process's write lock, then skip.
+WRITE_BUSY_TIMEOUT = 0.05
+_RESULT_FIELDS = tuple(f.name for f in fields(Result))
+_RULE_VALUES = struct.Struct(f"<{len(logic.RULE_NAMES)}d")
+_rule_values = operator.itemgetter(*logic.RULE_NAMES)
+
+
+@lru_cache(maxsize=16)
+def _rules_tag(version: str, values: tuple[float, ...]) -> bytes:
+    digest = hashlib.sha256(_RULE_VALUES.pack(*map(float, values))).digest()
+    return version.encode("utf-8") + b"|" + digest[:16] + b"|"
+
+
+def rules_tag(rules_version: str | None = None, rules: dict[str, float] | None = None) -> bytes:
+    # RULES_VERSION is bumped by hand; the digest still catches a rate edited without a bump.
+    return _rules_tag(rules_version if rules_version is not None else logic.RULES_VERSION,
+                      _rule_values(rules if rules is not None else vars(logic)))
+
+
+def _key(tag: bytes, inputs: Inputs) -> str:
+    # The packed wire row is already a normalized, fixed-width form of the inputs.
+    return hashlib.sha256(tag + pack_inputs(inputs)).hexdigest()
+
+
+def cache_key(inputs: Inputs, rules_version: str | None = None, rules: dict[str, float] | None = None) -> str:
+    return _key(rules_tag(rules_version, rules), inputs)
+
+
+def _encode_result(result: Result) -> str:
+    return json.dumps([getattr(result, name) for name in _RESULT_FIELDS], separators=(",", ":"))
+
+
+def _decode_result(payload: str) -> Result:
+    return Result(*json.loads(payload))
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    entries: int
+    size_bytes: int
+    evictions: int
+    skipped_writes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResultCache:
+    def __init__(self, path: str | Path, max_bytes: int = DEFAULT_MAX_BYTES,
+                 rules_version: str | None = None):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.rules_version = rules_version
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._skipped_writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30.0, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._write():
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results(accessed)")
+            # Running byte total kept by triggers, so puts never scan the table.
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta (name, value) "
+                "SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM results"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_insert AFTER INSERT ON results BEGIN "
+                "UPDATE meta SET value = value + new.size WHERE name = 'total_bytes'; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_delete AFTER DELETE ON results BEGIN "
+                "UPDATE meta SET value = value - old.size WHERE name = 'total_bytes'; END"
+            )
+            self._conn.execute(
+                "CREATE TRIGGER IF NOT EXISTS results_size_update AFTER UPDATE OF size ON results BEGIN "
+                "UPDATE meta SET value = value + new.size - old.size WHERE name = 'total_bytes'; END"
+            )
+        # Readers never wait in WAL mode, so this only bounds how long a write
+        # holds up a request thread when another process is writing.
+        self._conn.execute(f"PRAGMA busy_timeout = {int(WRITE_BUSY_TIMEOUT * 1000)}")
+
+    @contextmanager
+    def _write(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    def rules_tag(self) -> bytes:
+        return rules_tag(self.rules_version)
+
+    def key(self, inputs: Inputs) -> str:
+        return _key(self.rules_tag(), inputs)
+
+    def get(self, inputs: Inputs) -> Result | None:
+        return self.get_many([inputs])[0]
+
+    def put(self, inputs: Inputs, result: Result) -> None:
+        self.put_many([(inputs, result)])
+
+    def get_many(self, inputs_list: list[Inputs], tag: bytes | None = None) -> list[Result | None]:
+        tag = tag if tag is not None else self.rules_tag()
+        keys = [_key(tag, inputs) for inputs in inputs_list]
+        found: dict[str, str] = {}
+        stale: list[str] = []
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            # Stay well below SQLITE_MAX_VARIABLE_NUMBER on older builds.
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, payload, accessed FROM results WHERE key IN ({placeholders})", chunk
+                )
+                for key, payload, accessed in rows:
+                    found[key] = payload
+                    if now - accessed > TOUCH_INTERVAL:
+                        stale.append(key)
+            if stale:
+                try:
+                    with self._write():
+                        self._conn.executemany(
+                            "UPDATE results SET accessed = ? WHERE key = ?",
+                            [(now, key) for key in stale],
+                        )
+                except sqlite3.OperationalError:
+                    self._skipped_writes += 1
+            hits = sum(1 for key in keys if key in found)
+            self._hits += hits
+            self._misses += len(keys) - hits
+        return [_decode_result(found[key]) if key in found else None for key in keys]
+
+    def put_many(self, items: list[tuple[Inputs, Result]], tag: bytes | None = None) -> None:
+        if not items:
+            return
+        tag = tag if tag is not None else self.rules_tag()
+        now = time.time()
+        rows = []
+        for inputs, result in items:
+            payload = _encode_result(result)
+            rows.append((_key(tag, inputs), payload, len(payload), now))
+        with self._lock:
+            try:
+                with self._write():
+                    self._conn.executemany(
+                        "INSERT INTO results (key, payload, size, accessed) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET payload = excluded.payload, "
+                        "size = excluded.size, accessed = excluded.accessed",
+                        rows,
+                    )
+                    self._evict()
+            except sqlite3.OperationalError:
+                # Another process holds the write lock; the result is simply not cached.
+                self._skipped_writes += 1
+
+    def _evict(self) -> None:
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        # Free a little extra so a full cache does not evict on every put.
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY accessed"):
+            if total <= target:
+                break
+            victims.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM results WHERE key = ?", victims)
+        self._evictions += len(victims)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            size = self._total_bytes()
+            return CacheStats(hits=self._hits, misses=self._misses, entries=entries,
+                              size_bytes=size, evictions=self._evictions,
+                              skipped_writes=self._skipped_writes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
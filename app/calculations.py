@@ -38,6 +38,26 @@ INCOME_TAX_PERCENTAGE = 0.12
 DEFAULT_TAX_DEDUCTIBLE_COSTS_ETAT = 250.0
 DEFAULT_TAX_DEDUCTIBLE_COSTS_PERCENTAGE = 0.2
 
+# Bump whenever any rate or rule above changes, so cached results are not reused.
+RULES_VERSION = "2024.1"
+RULE_NAMES = (
+    "SOCIAL_EMPLOYEE_PERCENTAGE",
+    "HEALTH_PERCENTAGE",
+    "INCOME_TAX_PERCENTAGE",
+    "DEFAULT_TAX_DEDUCTIBLE_COSTS_ETAT",
+    "DEFAULT_TAX_DEDUCTIBLE_COSTS_PERCENTAGE",
+)
+
+
+def current_rules() -> dict[str, float]:
+    return {name: globals()[name] for name in RULE_NAMES}
+
+
+def load_rules(rules: dict[str, float], version: str) -> None:
+    global RULES_VERSION
+    globals().update({name: float(rules[name]) for name in RULE_NAMES})
+    RULES_VERSION = version
+
 
 def _round_to_two_decimals(value: float) -> float:
     return round(value + 1e-9, 2)
@@ -179,10 +199,49 @@ class CalculatorFactory:
         return calculator_class(inputs)
 
 
-def calculate_net_salary(inputs: Inputs) -> Result:
+_result_cache = None
+
+
+def set_result_cache(cache) -> None:
+    global _result_cache
+    _result_cache = cache
+
+
+def get_result_cache():
+    return _result_cache
+
+
+def _compute(inputs: Inputs) -> Result:
     calculator = CalculatorFactory.create_calculator(inputs)
     return calculator.calculate()
 
 
+def calculate_net_salary(inputs: Inputs) -> Result:
+    cache = _result_cache
+    if cache is None:
+        return _compute(inputs)
+
+    result = cache.get(inputs)
+    if result is None:
+        result = _compute(inputs)
+        cache.put(inputs, result)
+    return result
+
+
+def calculate_many(inputs_list: list[Inputs]) -> list[Result]:
+    cache = _result_cache
+    if cache is None:
+        return [_compute(inputs) for inputs in inputs_list]
+
+    results = cache.get_many(inputs_list)
+    missing = []
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = _compute(inputs_list[index])
+            missing.append((inputs_list[index], results[index]))
+    cache.put_many(missing)
+    return results
+
+
 def calc(inputs: Inputs) -> Result:
     return calculate_net_salary(inputs)
@@ -0,0 +1,319 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from multiprocessing import Pool
+from pathlib import Path
+
+from pydantic import ValidationError
+
+from . import calculations as logic
+from .schemas import CalcRequest
+
+
+DEFAULT_CHUNK_ROWS = 2000
+RESULT_FIELDS = tuple(f.name for f in fields(logic.Result))
+INPUT_FIELDS = tuple(CalcRequest.__fields__)
+
+
+def _format_error(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors())
+
+
+@dataclass
+class UnreadableRow:
+    # Stands in for an input line that could not be parsed, so it still gets an output row.
+    error: str
+
+
+def _error_row(error: str) -> dict:
+    return {**dict.fromkeys(INPUT_FIELDS), **dict.fromkeys(RESULT_FIELDS), "error": error}
+
+
+def process_chunk(rows: list[dict]) -> list[dict]:
+    valid, outputs = [], []
+    for row in rows:
+        if isinstance(row, UnreadableRow):
+            outputs.append(_error_row(row.error))
+            continue
+        if not isinstance(row, dict):
+            outputs.append(_error_row(f"row must be a JSON object, not {type(row).__name__}"))
+            continue
+        # Blank CSV cells mean "not given", so the schema defaults apply.
+        data = {key: value for key, value in row.items() if key in INPUT_FIELDS and value not in ("", None)}
+        try:
+            valid.append((len(outputs), CalcRequest.parse_obj(data).to_inputs()))
+            outputs.append({**row, **dict.fromkeys(RESULT_FIELDS), "error": ""})
+        except ValidationError as exc:
+            outputs.append({**row, **dict.fromkeys(RESULT_FIELDS), "error": _format_error(exc)})
+    results = logic.calculate_many([inputs for _, inputs in valid])
+    for (index, _), result in zip(valid, results):
+        outputs[index].update(result.__dict__)
+    return outputs
+
+
+def _init_worker(cache_path: str | None) -> None:
+    if cache_path:
+        from .cache import ResultCache
+        logic.set_result_cache(ResultCache(cache_path))
+
+
+@dataclass(frozen=True)
+class InputLayout:
+    path: str
+    jsonl: bool
+    # CSV header names; None for JSONL.
+    fieldnames: tuple[str, ...] | None
+    # Byte offset of the first data row.
+    data_start: int
+
+
+def read_layout(path: Path) -> InputLayout:
+    if path.suffix == ".jsonl":
+        return InputLayout(str(path), True, None, 0)
+    header = b""
+    with path.open("rb") as handle:
+        for line in handle:
+            header += line
+            # A quoted header cell may span lines; the record ends once the quotes balance.
+            if header.count(b'"') % 2 == 0:
+                break
+    names = next(csv.reader(io.StringIO(header.decode("utf-8"), newline="")), [])
+    return InputLayout(str(path), False, tuple(names), len(header))
+
+
+def input_ranges(layout: InputLayout, start: int, chunk_rows: int):
+    # Only record boundaries are found here, in bytes; the workers do the parsing.
+    with open(layout.path, "rb") as handle:
+        handle.seek(start)
+        chunk_start = offset = start
+        rows = 0
+        in_quotes = False
+        for line in handle:
+            offset += len(line)
+            # A newline inside a quoted CSV cell does not end the record.
+            if not layout.jsonl and line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            rows += 1
+            if rows == chunk_rows:
+                yield chunk_start, offset
+                chunk_start, rows = offset, 0
+        if offset > chunk_start:
+            yield chunk_start, offset
+
+
+def _read_range(layout: InputLayout, start: int, end: int) -> str:
+    with open(layout.path, "rb") as handle:
+        handle.seek(start)
+        return handle.read(end - start).decode("utf-8")
+
+
+def parse_rows(layout: InputLayout, text: str):
+    if not layout.jsonl:
+        yield from csv.DictReader(io.StringIO(text, newline=""), fieldnames=layout.fieldnames)
+        return
+    # Split on "\n" only: JSON strings may legally contain other line separators.
+    for line in text.split("\n"):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield UnreadableRow(f"invalid JSON: {exc.msg}")
+
+
+def serialise_rows(rows: list[dict], columns: tuple[str, ...] | None) -> bytes:
+    if columns is None:
+        return "".join(json.dumps(row, separators=(",", ":")) + "\n" for row in rows).encode("utf-8")
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def process_range(layout: InputLayout, start: int, end: int,
+                  columns: tuple[str, ...] | None) -> tuple[bytes, int]:
+    # Read, compute and serialise in the worker, so the parent only appends bytes.
+    outputs = process_chunk(list(parse_rows(layout, _read_range(layout, start, end))))
+    return serialise_rows(outputs, columns), len(outputs)
+
+
+def _range_keys(layout: InputLayout, start: int, end: int) -> list[str]:
+    keys = {}
+    for row in parse_rows(layout, _read_range(layout, start, end)):
+        if isinstance(row, dict):
+            keys.update(dict.fromkeys(row))
+    return list(keys)
+
+
+def output_columns(layout: InputLayout, pool, chunk_rows: int) -> tuple[str, ...]:
+    if layout.fieldnames is not None:
+        names = list(layout.fieldnames)
+    else:
+        # JSONL rows need not share keys; take their union in order of first appearance.
+        ranges = [(layout, start, end) for start, end in input_ranges(layout, layout.data_start, chunk_rows)]
+        names = list(dict.fromkeys(key for keys in pool.starmap(_range_keys, ranges) for key in keys))
+    return (*names, *(name for name in (*RESULT_FIELDS, "error") if name not in names))
+
+
+class OutputWriter:
+
+    def __init__(self, path: Path, append: bool):
+        self.path = path
+        self.handle = path.open("ab" if append else "wb")
+
+    def write_header(self, columns: tuple[str, ...]) -> None:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(columns)
+        self.handle.write(buffer.getvalue().encode("utf-8"))
+
+    def write(self, data: bytes) -> None:
+        self.handle.write(data)
+
+    def flush(self) -> int:
+        self.handle.flush()
+        os.fsync(self.handle.fileno())
+        return os.fstat(self.handle.fileno()).st_size
+
+    def close(self) -> None:
+        self.handle.close()
+
+
+class Checkpoint:
+
+    def __init__(self, path: Path, input_path: Path):
+        self.path = path
+        stat = input_path.stat()
+        self.identity = {"input": str(input_path.resolve()), "size": stat.st_size, "mtime": stat.st_mtime}
+
+    def load(self) -> dict | None:
+        if not self.path.exists():
+            return None
+        state = json.loads(self.path.read_text(encoding="utf-8"))
+        if {key: state.get(key) for key in self.identity} != self.identity:
+            raise SystemExit(f"{self.path} belongs to a different input file; use --restart")
+        if "input_offset" not in state:
+            raise SystemExit(f"{self.path} was written by an older version; use --restart")
+        return state
+
+    def save(self, rows_done: int, input_offset: int, output_bytes: int,
+             columns: tuple[str, ...] | None = None) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        state = {**self.identity, "rows_done": rows_done, "input_offset": input_offset,
+                 "output_bytes": output_bytes, "columns": None if columns is None else list(columns)}
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+class Progress:
+
+    def __init__(self, stream, start_rows: int, interval: float = 1.0):
+        self.stream = stream
+        self.start_rows = start_rows
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last = 0.0
+
+    def rate(self, rows_done: int) -> float:
+        elapsed = time.perf_counter() - self.started
+        return (rows_done - self.start_rows) / elapsed if elapsed else 0.0
+
+    def update(self, rows_done: int, force: bool = False) -> None:
+        if self.stream is None:
+            return
+        now = time.perf_counter()
+        if force or now - self.last >= self.interval:
+            self.last = now
+            self.stream.write(f"\r{rows_done} rows  {self.rate(rows_done):,.0f} rows/s")
+            self.stream.flush()
+
+
+def run(input_path: Path, output_path: Path, workers: int | None = None,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS, checkpoint_path: Path | None = None,
+        restart: bool = False, cache_path: str | None = None, progress_stream=None) -> dict:
+    workers = workers or os.cpu_count() or 1
+    checkpoint = Checkpoint(checkpoint_path or output_path.with_name(output_path.name + ".ckpt"), input_path)
+    if restart:
+        checkpoint.remove()
+    state = checkpoint.load()
+    layout = read_layout(input_path)
+    resumed = state is not None and output_path.exists()
+    if resumed:
+        # Drop anything written after the last checkpoint, then skip what it covers.
+        with output_path.open("r+b") as handle:
+            handle.truncate(state["output_bytes"])
+    rows_done = state["rows_done"] if resumed else 0
+    input_offset = state["input_offset"] if resumed else layout.data_start
+
+    writer = OutputWriter(output_path, append=resumed)
+    progress = Progress(progress_stream, rows_done)
+    try:
+        with Pool(workers, initializer=_init_worker, initargs=(cache_path,)) as pool:
+            if resumed:
+                # The column order is fixed once, by the run that wrote the header.
+                columns = None if state["columns"] is None else tuple(state["columns"])
+            elif output_path.suffix == ".jsonl":
+                columns = None
+            else:
+                columns = output_columns(layout, pool, chunk_rows)
+                writer.write_header(columns)
+            pending = deque()
+            # Keep a bounded window in flight so memory stays flat on huge inputs.
+            for start, end in input_ranges(layout, input_offset, chunk_rows):
+                pending.append((end, pool.apply_async(process_range, (layout, start, end, columns))))
+                if len(pending) >= workers * 2:
+                    rows_done = _drain_one(pending, writer, checkpoint, rows_done, columns, progress)
+            while pending:
+                rows_done = _drain_one(pending, writer, checkpoint, rows_done, columns, progress)
+    finally:
+        writer.close()
+
+    progress.update(rows_done, force=True)
+    if progress_stream is not None:
+        progress_stream.write("\n")
+    checkpoint.remove()
+    return {"rows": rows_done, "workers": workers, "rows_per_s": round(progress.rate(rows_done), 1)}
+
+
+def _drain_one(pending: deque, writer: OutputWriter, checkpoint: Checkpoint, rows_done: int,
+               columns: tuple[str, ...] | None, progress: Progress) -> int:
+    input_end, result = pending.popleft()
+    data, rows = result.get()
+    writer.write(data)
+    rows_done += rows
+    checkpoint.save(rows_done, input_end, writer.flush(), columns)
+    progress.update(rows_done)
+    return rows_done
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli",
+        description="Compute net salaries for a file of employee rows on all CPU cores.")
+    parser.add_argument("input", type=Path, help="CSV with a header row, or .jsonl")
+    parser.add_argument("output", type=Path, help="CSV or .jsonl; rows come out in input order")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--checkpoint", type=Path, help="checkpoint file (default: OUTPUT.ckpt)")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    parser.add_argument("--cache", help="SQLite result cache shared by the workers")
+    parser.add_argument("--quiet", action="store_true", help="no progress output")
+    args = parser.parse_args(argv)
+
+    summary = run(args.input, args.output, args.workers, args.chunk_rows, args.checkpoint,
+                  args.restart, args.cache, None if args.quiet else sys.stderr)
+    if not args.quiet:
+        print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DEFAULT_MINIMUM_SIZE = 1024
+
+
+def supported_encodings() -> tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str, available: tuple[str, ...] | None = None) -> str | None:
+    available = available if available is not None else supported_encodings()
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        # `available` is ordered by preference, so ties keep the earlier one.
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _GzipStream:
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def make_stream(encoding: str, gzip_level: int = 6, brotli_quality: int = 4):
+    if encoding == "gzip":
+        return _GzipStream(gzip_level)
+    if encoding == "br" and brotli is not None:
+        return _BrotliStream(brotli_quality)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class CompressionMiddleware:
+
+    def __init__(self, app, minimum_size: int = DEFAULT_MINIMUM_SIZE,
+                 gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressingResponder(send, encoding, self)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingResponder:
+
+    def __init__(self, send, encoding: str, options: CompressionMiddleware):
+        self.send = send
+        self.encoding = encoding
+        self.options = options
+        self.start_message = None
+        self.buffer = b""
+        self.stream = None
+        self.passthrough = False
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = {name.lower() for name, _ in message.get("headers", [])}
+            self.passthrough = b"content-encoding" in headers
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.passthrough:
+            await self._flush_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is None:
+            self.buffer += body
+            if len(self.buffer) < self.options.minimum_size:
+                if more_body:
+                    # Hold back small leading chunks until we know whether the
+                    # response is big enough to be worth compressing.
+                    return
+                await self._flush_start()
+                await self.send({"type": "http.response.body", "body": self.buffer})
+                return
+
+            self.stream = make_stream(self.encoding, self.options.gzip_level, self.options.brotli_quality)
+            body, self.buffer = self.buffer, b""
+            if not more_body:
+                compressed = self.stream.finish(body)
+                await self._flush_start(compressed=True, content_length=len(compressed))
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            await self._flush_start(compressed=True)
+
+        if more_body:
+            chunk = self.stream.compress(body)
+            if chunk:
+                await self.send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            await self.send({"type": "http.response.body", "body": self.stream.finish(body)})
+
+    async def _flush_start(self, compressed: bool = False, content_length: int | None = None):
+        if self.start_message is None:
+            return
+        message, self.start_message = self.start_message, None
+        if compressed:
+            headers = [(name, value) for name, value in message.get("headers", [])
+                       if name.lower() != b"content-length"]
+            headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+            headers.append((b"vary", b"Accept-Encoding"))
+            if content_length is not None:
+                headers.append((b"content-length", str(content_length).encode("latin-1")))
+            message = {**message, "headers": headers}
+        await self.send(message)
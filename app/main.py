@@ -1,35 +1,212 @@
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+from dataclasses import asdict
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
-from .schemas import CalcRequest, CalcResponse
+import asyncio
+import hmac
+import json
+import math
+import os
+from pydantic import ValidationError
+from .schemas import BULK_MAX_ITEMS, BulkCalcRequest, CalcRequest, CalcResponse
 from . import calculations as logic
+from .cache import ResultCache, DEFAULT_MAX_BYTES
+from .shared import DEFAULT_SLOTS, SharedResultCache, SharedSegment
+from .compression import CompressionMiddleware, DEFAULT_MINIMUM_SIZE
+from . import wire
+from .admission import AdmissionController, AdmissionMiddleware, Lane
+from .profiler import ProfilerBusy, SamplingProfiler
 
 app = FastAPI(title="Kalkulator wynagrodzenia netto (UPROSZCZONY)",
               description="Model edukacyjny do testów – nie używać do rozliczeń!",
               version="0.1.0")
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.environ.get("SALARY_COMPRESS_MIN_BYTES", DEFAULT_MINIMUM_SIZE)),
+)
+
+# Separate budgets keep single calculations from the calculator page responsive
+# while a payroll batch saturates the bulk lane.
+admission = AdmissionController(
+    interactive=Lane(
+        "interactive",
+        max_concurrency=int(os.environ.get("SALARY_INTERACTIVE_CONCURRENCY", 24)),
+        max_queue=int(os.environ.get("SALARY_INTERACTIVE_QUEUE", 128)),
+        queue_timeout=float(os.environ.get("SALARY_INTERACTIVE_QUEUE_TIMEOUT", 2.0)),
+        retry_after=1,
+    ),
+    bulk=Lane(
+        "bulk",
+        max_concurrency=int(os.environ.get("SALARY_BULK_CONCURRENCY", 2)),
+        max_queue=int(os.environ.get("SALARY_BULK_QUEUE", 8)),
+        queue_timeout=float(os.environ.get("SALARY_BULK_QUEUE_TIMEOUT", 30.0)),
+        retry_after=10,
+    ),
+)
+app.add_middleware(AdmissionMiddleware, controller=admission)
+
+# Rows per streamed chunk of a bulk response; large enough for the compressor
+# to find repetition, small enough that the first bytes leave quickly.
+BULK_CHUNK_ROWS = 256
+
+_cache = None
+if os.environ.get("SALARY_CACHE_PATH"):
+    _cache = ResultCache(
+        os.environ["SALARY_CACHE_PATH"],
+        max_bytes=int(os.environ.get("SALARY_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    )
+if os.environ.get("SALARY_SHM_NAME"):
+    # Every uvicorn worker attaches to the same segment; the first one creates it.
+    _segment = SharedSegment.attach_or_create(
+        os.environ["SALARY_SHM_NAME"],
+        slots=int(os.environ.get("SALARY_SHM_SLOTS", DEFAULT_SLOTS)),
+    )
+    _cache = SharedResultCache(_segment, fallback=_cache)
+
+    @app.on_event("shutdown")
+    def _release_segment():
+        # Only the creating worker removes the name; the others just unmap it.
+        owner = _segment.owner
+        _segment.close()
+        if owner:
+            _segment.unlink()
+logic.set_result_cache(_cache)
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
-@app.post("/api/calculate", response_model=CalcResponse)
-def calculate(req: CalcRequest):
-    res = logic.calc(
-        logic.Inputs(
-            gross=float(req.gross),
-            contract=logic.ContractType(req.contract.value),
-            age=req.age,
-            is_student=req.is_student,
-            tax_deductible_fixed=req.tax_deductible_fixed,
-            tax_deductible_percent=req.tax_deductible_percent,
-            creative_50=req.creative_50,
-            youth_tax_relief=req.youth_tax_relief,
-            include_social_for_mandate=req.include_social_for_mandate,
-        )
-    )
+# Admin endpoints are disabled unless a token is configured.
+ADMIN_TOKEN = os.environ.get("SALARY_ADMIN_TOKEN")
+profiler = SamplingProfiler()
+
+def _require_admin(request: Request) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+@app.post("/admin/profile", dependencies=[Depends(_require_admin)])
+async def admin_profile(seconds: float = 5.0, rate: float = 100.0, format: str = "collapsed",
+                        include_idle: bool = False):
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=422, detail="format must be 'collapsed' or 'json'")
+    if not (math.isfinite(seconds) and math.isfinite(rate)):
+        raise HTTPException(status_code=422, detail="seconds and rate must be finite numbers")
+    try:
+        # Sample from a separate thread so the event loop keeps serving traffic.
+        result = await asyncio.to_thread(profiler.profile, seconds, rate, include_idle)
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if format == "json":
+        return result.as_dict()
+    return PlainTextResponse(result.collapsed())
+
+@app.get("/metrics/admission")
+def admission_metrics():
+    return {name: asdict(stats) for name, stats in admission.snapshot().items()}
+
+def _inline_schema(model) -> dict:
+    schema = model.schema()
+    definitions = schema.pop("definitions", {})
+
+    def resolve(node):
+        if isinstance(node, dict):
+            ref = node.get("$ref", "")
+            if ref.startswith("#/definitions/"):
+                return resolve(definitions[ref.rsplit("/", 1)[1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
+
+def _body_docs(model, bulk: bool = False) -> dict:
+    schema = _inline_schema(model)
+    content = {fmt: {"schema": schema} for fmt in wire.available_formats()}
+    if bulk:
+        content[wire.ROWS] = {"schema": {"type": "string", "format": "binary"}}
+    return {"requestBody": {"required": True, "content": content}}
+
+def _parse_body(body: bytes, fmt: str, model, bulk: bool):
+    if fmt == wire.ROWS:
+        # Rows are fixed width, so the limit is checked before anything is unpacked.
+        if len(body) // wire.INPUT_ROW.size > BULK_MAX_ITEMS:
+            raise RequestValidationError([{"loc": ("body",), "msg": f"at most {BULK_MAX_ITEMS} rows",
+                                           "type": "value_error"}])
+        try:
+            return wire.unpack_rows(body)
+        except wire.RowError as exc:
+            loc = ("body",) if exc.row is None else ("body", exc.row, exc.field)
+            raise RequestValidationError([{"loc": loc, "msg": exc.message, "type": "value_error"}])
+    try:
+        data = wire.decode(body, fmt)
+    except ValueError:
+        raise RequestValidationError([{"loc": ("body",), "msg": f"invalid {fmt} body",
+                                       "type": "value_error"}])
+    try:
+        req = model.parse_obj(data)
+    except ValidationError as exc:
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in exc.errors()])
+    if bulk:
+        return [item.to_inputs() for item in req.items]
+    return req.to_inputs()
+
+async def _decode_body(request: Request, model, bulk: bool = False):
+    try:
+        fmt = wire.request_format(request.headers.get("content-type"), bulk=bulk)
+    except wire.UnsupportedMediaType as exc:
+        raise HTTPException(status_code=415, detail=str(exc))
+    body = await request.body()
+    if bulk:
+        # Parsing thousands of rows takes hundreds of milliseconds; doing it on
+        # the event loop would stall every interactive request behind it.
+        return await run_in_threadpool(_parse_body, body, fmt, model, bulk)
+    return _parse_body(body, fmt, model, bulk)
+
+async def _single_inputs(request: Request) -> logic.Inputs:
+    return await _decode_body(request, CalcRequest)
+
+async def _bulk_inputs(request: Request) -> list[logic.Inputs]:
+    return await _decode_body(request, BulkCalcRequest, bulk=True)
+
+@app.post("/api/calculate", response_model=CalcResponse, openapi_extra=_body_docs(CalcRequest))
+def calculate(request: Request, inputs: logic.Inputs = Depends(_single_inputs)):
+    res = logic.calc(inputs)
+    fmt = wire.response_format(request.headers.get("accept"))
+    if fmt != wire.JSON:
+        return Response(wire.encode(res.__dict__, fmt), media_type=fmt)
     return CalcResponse(**res.__dict__)
 
+def _stream_bulk(inputs_list: list[logic.Inputs], fmt: str = wire.JSON):
+    if fmt == wire.MSGPACK:
+        yield wire.msgpack_array_header(len(inputs_list))
+    elif fmt == wire.JSON:
+        yield b"["
+    for start in range(0, len(inputs_list), BULK_CHUNK_ROWS):
+        results = logic.calculate_many(inputs_list[start:start + BULK_CHUNK_ROWS])
+        if fmt == wire.ROWS:
+            yield wire.pack_results(results)
+        elif fmt == wire.MSGPACK:
+            yield b"".join(wire.encode(res.__dict__, fmt) for res in results)
+        else:
+            rows = ",".join(json.dumps(res.__dict__, separators=(",", ":")) for res in results)
+            yield (rows if start == 0 else "," + rows).encode("utf-8")
+    if fmt == wire.JSON:
+        yield b"]"
+
+@app.post("/api/calculate/bulk", response_model=list[CalcResponse],
+          openapi_extra=_body_docs(BulkCalcRequest, bulk=True))
+def calculate_bulk(request: Request, inputs_list: list[logic.Inputs] = Depends(_bulk_inputs)):
+    fmt = wire.response_format(request.headers.get("accept"), bulk=True)
+    return StreamingResponse(_stream_bulk(inputs_list, fmt), media_type=fmt)
 
 app.mount("/static", StaticFiles(directory=str(Path(__file__).resolve().parent.parent / "static")), name="static")
 
@@ -0,0 +1,137 @@
+import math
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from . import calculations
+
+
+# Every tick walks every thread's stack under the GIL; keep that a small share of a core.
+MAX_RATE_HZ = 250
+MAX_SECONDS = 60.0
+MAX_STACK_DEPTH = 128
+
+_CALCULATIONS_FILE = calculations.__file__
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+}
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _frame_label(code) -> str:
+    return f"{Path(code.co_filename).name}:{code.co_qualname}"
+
+
+@dataclass
+class Profile:
+    rate_hz: float
+    duration_s: float = 0.0
+    ticks: int = 0
+    samples: int = 0
+    stacks: Counter = field(default_factory=Counter)
+    calc_self: Counter = field(default_factory=Counter)
+    calc_total: Counter = field(default_factory=Counter)
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def calculations_timings(self) -> list[dict]:
+        # Each sample stands for one sampling interval of wall time in that thread.
+        interval_ms = self.duration_s * 1000.0 / self.ticks if self.ticks else 0.0
+        return [
+            {
+                "function": name,
+                "self_samples": self.calc_self[name],
+                "total_samples": total,
+                "self_ms": round(self.calc_self[name] * interval_ms, 3),
+                "total_ms": round(total * interval_ms, 3),
+            }
+            for name, total in self.calc_total.most_common()
+        ]
+
+    def as_dict(self) -> dict:
+        return {
+            "rate_hz": self.rate_hz,
+            "duration_s": round(self.duration_s, 3),
+            "ticks": self.ticks,
+            "samples": self.samples,
+            "calculations": self.calculations_timings(),
+            "stacks": dict(self.stacks.most_common()),
+        }
+
+
+class SamplingProfiler:
+
+    def __init__(self):
+        # Guards only start/stop of a session; request threads never touch it.
+        self._session = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._session.locked()
+
+    def profile(self, seconds: float, rate_hz: float = 100.0, include_idle: bool = False) -> Profile:
+        # NaN slips through min/max clamping and would disable the deadline or the sleep.
+        if not (math.isfinite(seconds) and math.isfinite(rate_hz)):
+            raise ValueError("seconds and rate must be finite numbers")
+        seconds = min(max(seconds, 0.01), MAX_SECONDS)
+        rate_hz = min(max(rate_hz, 1.0), MAX_RATE_HZ)
+        if not self._session.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already being recorded")
+        try:
+            return self._sample(seconds, rate_hz, include_idle)
+        finally:
+            self._session.release()
+
+    def _sample(self, seconds: float, rate_hz: float, include_idle: bool) -> Profile:
+        profile = Profile(rate_hz=rate_hz)
+        interval = 1.0 / rate_hz
+        me = threading.get_ident()
+        started = time.perf_counter()
+        next_tick = started
+        deadline = started + seconds
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            if now < next_tick:
+                time.sleep(next_tick - now)
+            # Skip missed ticks instead of bursting, which keeps the rate bounded.
+            next_tick = max(next_tick + interval, time.perf_counter())
+            profile.ticks += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != me:
+                    self._record(profile, frame, include_idle)
+        profile.duration_s = time.perf_counter() - started
+        return profile
+
+    def _record(self, profile: Profile, frame, include_idle: bool) -> None:
+        leaf = frame.f_code
+        if not include_idle and (Path(leaf.co_filename).name, leaf.co_name) in _IDLE_LEAVES:
+            return
+        labels = []
+        seen_calc = set()
+        is_leaf = True
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            labels.append(_frame_label(code))
+            if code.co_filename == _CALCULATIONS_FILE:
+                name = code.co_qualname
+                if is_leaf:
+                    profile.calc_self[name] += 1
+                if name not in seen_calc:
+                    seen_calc.add(name)
+                    profile.calc_total[name] += 1
+            is_leaf = False
+            frame = frame.f_back
+        profile.samples += 1
+        profile.stacks[";".join(reversed(labels))] += 1
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field
 from enum import Enum
 from typing import Annotated, Optional
+from . import calculations as logic
 
 class ContractType(str, Enum):
     employment = "employment"
@@ -18,10 +19,28 @@ class CalcRequest(BaseModel):
     youth_tax_relief: bool = False
     include_social_for_mandate: bool = True
 
+    def to_inputs(self) -> logic.Inputs:
+        return logic.Inputs(
+            gross=float(self.gross),
+            contract=logic.ContractType(self.contract.value),
+            age=self.age,
+            is_student=self.is_student,
+            tax_deductible_fixed=self.tax_deductible_fixed,
+            tax_deductible_percent=self.tax_deductible_percent,
+            creative_50=self.creative_50,
+            youth_tax_relief=self.youth_tax_relief,
+            include_social_for_mandate=self.include_social_for_mandate,
+        )
+
 class CalcResponse(BaseModel):
     social_total: float
     health: float
     tax_deductible_costs: float
     pit_base: float
     pit: float
-    net: float
\ No newline at end of file
+    net: float
+
+BULK_MAX_ITEMS = 10000
+
+class BulkCalcRequest(BaseModel):
+    items: list[CalcRequest] = Field(..., min_items=1, max_items=BULK_MAX_ITEMS)
@@ -0,0 +1,217 @@
+import hashlib
+import struct
+import threading
+import time
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+
+from . import calculations as logic
+from .cache import rules_tag
+from .calculations import Inputs, Result
+from .wire import pack_inputs
+
+
+MAGIC = b"SAL1"
+DEFAULT_SLOTS = 65536
+
+_HEADER = struct.Struct(f"<4sIQQ32s{len(logic.RULE_NAMES)}d")
+# crc32, padding, generation, 16-byte key digest, then the six Result fields.
+_SLOT = struct.Struct("<IIQ16s6d")
+_GENERATION_OFFSET = 8
+
+
+def _header_size() -> int:
+    # Start the slot table on a cache-line boundary.
+    return -(-_HEADER.size // 64) * 64
+
+
+def segment_size(slots: int) -> int:
+    return _header_size() + slots * _SLOT.size
+
+
+def inputs_digest(inputs: Inputs) -> bytes:
+    return hashlib.blake2b(pack_inputs(inputs), digest_size=16).digest()
+
+
+class SharedSegment:
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self.buf = shm.buf
+        self.slots = _HEADER.unpack_from(self.buf, 0)[3]
+
+    @classmethod
+    def create(cls, name: str | None = None, slots: int = DEFAULT_SLOTS) -> "SharedSegment":
+        shm = shared_memory.SharedMemory(name=name, create=True, size=segment_size(slots))
+        _untrack(shm)
+        rules = logic.current_rules()
+        # Magic goes in last so attaching workers never see a half-written header.
+        _HEADER.pack_into(shm.buf, 0, b"\0\0\0\0", _SLOT.size, 1, slots,
+                          logic.RULES_VERSION.encode("utf-8"), *(rules[n] for n in logic.RULE_NAMES))
+        struct.pack_into("<4s", shm.buf, 0, MAGIC)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str, timeout: float = 5.0) -> "SharedSegment":
+        shm = shared_memory.SharedMemory(name=name, create=False)
+        _untrack(shm)
+        deadline = time.monotonic() + timeout
+        while bytes(shm.buf[:4]) != MAGIC:
+            if time.monotonic() > deadline:
+                shm.close()
+                raise RuntimeError(f"Shared segment {name!r} was never initialised")
+            time.sleep(0.01)
+        slot_size = struct.unpack_from("<I", shm.buf, 4)[0]
+        if slot_size != _SLOT.size:
+            shm.close()
+            raise RuntimeError(f"Shared segment {name!r} has an incompatible layout")
+        return cls(shm, owner=False)
+
+    @classmethod
+    def attach_or_create(cls, name: str, slots: int = DEFAULT_SLOTS) -> "SharedSegment":
+        try:
+            return cls.create(name, slots)
+        except FileExistsError:
+            segment = cls.attach(name)
+        # A segment left behind by an earlier deployment must not push its
+        # rules onto this code; republishing also invalidates its slots.
+        version, rules = segment.rules()
+        if version != logic.RULES_VERSION or rules != logic.current_rules():
+            try:
+                segment.publish_rules(logic.current_rules(), logic.RULES_VERSION)
+            except ValueError:
+                segment.close()
+                raise
+        return segment
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def generation(self) -> int:
+        return struct.unpack_from("<Q", self.buf, _GENERATION_OFFSET)[0]
+
+    def rules(self) -> tuple[str, dict[str, float]]:
+        _, _, _, _, version, *values = _HEADER.unpack_from(self.buf, 0)
+        return version.rstrip(b"\0").decode("utf-8"), dict(zip(logic.RULE_NAMES, values))
+
+    def publish_rules(self, rules: dict[str, float], version: str) -> int:
+        values = [float(rules[name]) for name in logic.RULE_NAMES]
+        current_version, current_rules = self.rules()
+        if version == current_version:
+            if list(current_rules.values()) == values:
+                return self.generation
+            # Persistent caches key on the version alone, so it must change with the rules.
+            raise ValueError(f"Rules changed without a RULES_VERSION bump (still {version!r})")
+        generation = self.generation + 1
+        _HEADER.pack_into(self.buf, 0, MAGIC, _SLOT.size, self.generation, self.slots,
+                          version.encode("utf-8"), *values)
+        # Bumping the generation is what invalidates every cached slot at once.
+        struct.pack_into("<Q", self.buf, _GENERATION_OFFSET, generation)
+        return generation
+
+    def slot_offset(self, digest: bytes) -> int:
+        return _header_size() + (int.from_bytes(digest[:8], "little") % self.slots) * _SLOT.size
+
+    def read_slot(self, digest: bytes, generation: int) -> Result | None:
+        offset = self.slot_offset(digest)
+        # Copy the slot once so the checksum covers exactly the bytes we return.
+        raw = bytes(self.buf[offset:offset + _SLOT.size])
+        crc, _, slot_generation, slot_digest, *values = _SLOT.unpack(raw)
+        if slot_generation != generation or slot_digest != digest:
+            return None
+        # A concurrent writer can leave a torn slot behind; the checksum catches it.
+        if crc != zlib.crc32(raw[4:]):
+            return None
+        return Result(*values)
+
+    def write_slot(self, digest: bytes, generation: int, result: Result) -> None:
+        offset = self.slot_offset(digest)
+        # Checksum a private copy, then publish it in one copy: if two workers
+        # interleave on the same slot, the mixed bytes can never match either CRC.
+        body = _SLOT.pack(0, 0, generation, digest,
+                          result.social_total, result.health, result.tax_deductible_costs,
+                          result.pit_base, result.pit, result.net)[4:]
+        self.buf[offset:offset + _SLOT.size] = struct.pack("<I", zlib.crc32(body)) + body
+
+    def close(self) -> None:
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self) -> None:
+        # SharedMemory.unlink() unregisters the name again; re-register to keep the tracker consistent.
+        resource_tracker.register(self.shm._name, "shared_memory")
+        self.shm.unlink()
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    # The resource tracker would unlink the segment when any one worker exits.
+    resource_tracker.unregister(shm._name, "shared_memory")
+
+
+class SharedResultCache:
+
+    def __init__(self, segment: SharedSegment, fallback=None):
+        self.segment = segment
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+        # (generation, fallback key tag) of the rules this process last loaded.
+        self._synced = None
+        # What this thread's last lookup saw, i.e. the rules its next put was
+        # computed under.
+        self._lookup = threading.local()
+        self._sync_rules()
+
+    def _sync_rules(self) -> tuple[int, bytes]:
+        generation = self.segment.generation
+        synced = self._synced
+        if synced is None or synced[0] != generation:
+            version, rules = self.segment.rules()
+            if version != logic.RULES_VERSION or rules != logic.current_rules():
+                logic.load_rules(rules, version)
+            synced = self._synced = (generation, rules_tag(version, rules))
+        return synced
+
+    def get(self, inputs: Inputs) -> Result | None:
+        return self.get_many([inputs])[0]
+
+    def put(self, inputs: Inputs, result: Result) -> None:
+        self.put_many([(inputs, result)])
+
+    def get_many(self, inputs_list: list[Inputs]) -> list[Result | None]:
+        generation, tag = self._lookup.synced = self._sync_rules()
+        results = [self.segment.read_slot(inputs_digest(inputs), generation) for inputs in inputs_list]
+        if self.fallback is not None:
+            missing = [index for index, result in enumerate(results) if result is None]
+            if missing:
+                found = self.fallback.get_many([inputs_list[index] for index in missing], tag=tag)
+                for index, result in zip(missing, found):
+                    if result is not None:
+                        results[index] = result
+                        self.segment.write_slot(inputs_digest(inputs_list[index]), generation, result)
+        hits = sum(1 for result in results if result is not None)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, items: list[tuple[Inputs, Result]]) -> None:
+        # Stamp with the generation this thread looked up under, not the shared
+        # current one, so a reload between get and put leaves a dead slot
+        # rather than a stale live one.
+        synced = getattr(self._lookup, "synced", None) or self._sync_rules()
+        self._lookup.synced = None
+        generation, tag = synced
+        for inputs, result in items:
+            self.segment.write_slot(inputs_digest(inputs), generation, result)
+        # The persistent store outlives the generation, so a result that raced
+        # a reload is not written there at all.
+        if self.fallback is not None and self.segment.generation == generation:
+            self.fallback.put_many(items, tag=tag)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,149 @@
+import json
+import math
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .calculations import ContractType, Inputs, Result
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+# Fixed-width little-endian records, one per employee; bulk endpoints only.
+ROWS = "application/vnd.salary.rows"
+
+_MEDIA_ALIASES = {"application/x-msgpack": MSGPACK}
+_CONTRACTS = tuple(ContractType)
+
+# gross, contract index, age, is_student, fixed costs, percent costs (NaN = not set),
+# creative_50, youth_tax_relief, include_social_for_mandate
+INPUT_ROW = struct.Struct("<dBi?dd???")
+RESULT_ROW = struct.Struct("<6d")
+
+
+class UnsupportedMediaType(ValueError):
+    pass
+
+
+class RowError(ValueError):
+
+    def __init__(self, row: int | None, field: str, message: str):
+        super().__init__(f"{field}: {message}" if row is None else f"row {row}: {field}: {message}")
+        self.row = row
+        self.field = field
+        self.message = message
+
+
+def available_formats(bulk: bool = False) -> tuple[str, ...]:
+    formats = (JSON, MSGPACK) if msgpack is not None else (JSON,)
+    return formats + (ROWS,) if bulk else formats
+
+
+def _media_type(value: str) -> str:
+    media = value.split(";", 1)[0].strip().lower()
+    return _MEDIA_ALIASES.get(media, media)
+
+
+def request_format(content_type: str | None, bulk: bool = False) -> str:
+    if not content_type:
+        return JSON
+    media = _media_type(content_type)
+    if media == JSON or media.endswith("+json"):
+        return JSON
+    if media in available_formats(bulk):
+        return media
+    raise UnsupportedMediaType(f"Unsupported content type: {media}")
+
+
+def response_format(accept: str | None, bulk: bool = False) -> str:
+    if not accept:
+        return JSON
+    available = available_formats(bulk)
+    best, best_quality = JSON, 0.0
+    for part in accept.split(","):
+        media, _, params = part.partition(";")
+        media = _media_type(media)
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if media in available and quality > best_quality:
+            best, best_quality = media, quality
+    return best
+
+
+def decode(body: bytes, fmt: str):
+    if fmt == MSGPACK:
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def encode(data, fmt: str) -> bytes:
+    if fmt == MSGPACK:
+        return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def pack_inputs(inputs: Inputs) -> bytes:
+    return INPUT_ROW.pack(
+        float(inputs.gross),
+        _CONTRACTS.index(inputs.contract),
+        int(inputs.age),
+        inputs.is_student,
+        math.nan if inputs.tax_deductible_fixed is None else float(inputs.tax_deductible_fixed),
+        math.nan if inputs.tax_deductible_percent is None else float(inputs.tax_deductible_percent),
+        inputs.creative_50,
+        inputs.youth_tax_relief,
+        inputs.include_social_for_mandate,
+    )
+
+
+def unpack_rows(body: bytes) -> list[Inputs]:
+    if not body or len(body) % INPUT_ROW.size:
+        raise RowError(None, "body",
+                       f"length must be a positive multiple of {INPUT_ROW.size} bytes")
+    inputs_list = []
+    for row, (gross, contract, age, is_student, fixed, percent, creative_50, youth, social) in \
+            enumerate(INPUT_ROW.iter_unpack(body)):
+        # Same constraints as CalcRequest, checked without building pydantic models.
+        if not gross > 0 or math.isinf(gross):
+            raise RowError(row, "gross", "must be a finite number greater than 0")
+        if contract >= len(_CONTRACTS):
+            raise RowError(row, "contract", "unknown contract type")
+        if not 0 <= age <= 120:
+            raise RowError(row, "age", "must be between 0 and 120")
+        if not (math.isnan(fixed) or 0 <= fixed < math.inf):
+            raise RowError(row, "tax_deductible_fixed", "must be greater than or equal to 0")
+        if not (math.isnan(percent) or 0 <= percent <= 1):
+            raise RowError(row, "tax_deductible_percent", "must be between 0 and 1")
+        inputs_list.append(Inputs(
+            gross=gross,
+            contract=_CONTRACTS[contract],
+            age=age,
+            is_student=is_student,
+            tax_deductible_fixed=None if math.isnan(fixed) else fixed,
+            tax_deductible_percent=None if math.isnan(percent) else percent,
+            creative_50=creative_50,
+            youth_tax_relief=youth,
+            include_social_for_mandate=social,
+        ))
+    return inputs_list
+
+
+def pack_results(results: list[Result]) -> bytes:
+    return b"".join(RESULT_ROW.pack(r.social_total, r.health, r.tax_deductible_costs,
+                                    r.pit_base, r.pit, r.net) for r in results)
+
+
+def unpack_results(body: bytes) -> list[Result]:
+    return [Result(*values) for values in RESULT_ROW.iter_unpack(body)]
+
+
+def msgpack_array_header(length: int) -> bytes:
+    return msgpack.Packer().pack_array_header(length)
@@ -1,6 +1,14 @@
+import asyncio
+
+import httpx
+import msgpack
 import pytest
 from fastapi.testclient import TestClient
+from app import main
 from app.main import app
+from app import wire
+from app.calculations import ContractType, Inputs
+from tools.loadtest import PayloadGenerator, run_load
 
 
 @pytest.fixture
@@ -280,3 +288,280 @@ class TestStaticFilesAndFrontend:
         assert response.status_code == 200
         content_type = response.headers.get("content-type", "")
         assert "javascript" in content_type or "text/plain" in content_type
+
+
+class TestBulkEndpoint:
+    """Integration tests for the streamed bulk calculation endpoint."""
+
+    def test_bulk_results_match_single_calculations(self, client):
+        """Test that bulk rows equal the single-calculation responses in order."""
+        # Arrange
+        items = [
+            {"gross": 8000, "contract": "employment"},
+            {"gross": 4000, "contract": "mandate", "age": 22, "is_student": True},
+            {"gross": 3000, "contract": "work", "creative_50": True},
+        ]
+
+        # Act
+        response = client.post("/api/calculate/bulk", json={"items": items})
+
+        # Assert
+        assert response.status_code == 200
+        expected = [client.post("/api/calculate", json=item).json() for item in items]
+        assert response.json() == expected
+
+    def test_bulk_rejects_empty_batch(self, client):
+        """Test that an empty batch fails validation."""
+        # Arrange & Act
+        response = client.post("/api/calculate/bulk", json={"items": []})
+
+        # Assert
+        assert response.status_code == 422
+
+    def test_large_bulk_response_is_gzip_compressed(self, client):
+        """Test that large bulk replies are compressed when the client accepts gzip."""
+        # Arrange
+        items = [{"gross": 5000 + i, "contract": "employment"} for i in range(600)]
+
+        # Act
+        response = client.post("/api/calculate/bulk", json={"items": items},
+                               headers={"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()) == 600
+
+    def test_small_response_is_not_compressed(self, client):
+        """Test that tiny single-row replies skip compression."""
+        # Arrange
+        payload = {"gross": 8000, "contract": "employment"}
+
+        # Act
+        response = client.post("/api/calculate", json=payload, headers={"Accept-Encoding": "gzip"})
+
+        # Assert
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+
+    def test_response_is_not_compressed_without_accept_encoding(self, client):
+        """Test that compression is only applied when negotiated."""
+        # Arrange
+        items = [{"gross": 5000 + i, "contract": "work"} for i in range(600)]
+
+        # Act
+        response = client.post("/api/calculate/bulk", json={"items": items},
+                               headers={"Accept-Encoding": "identity"})
+
+        # Assert
+        assert "content-encoding" not in response.headers
+        assert len(response.json()) == 600
+
+
+class TestBinaryWireFormats:
+    """Integration tests for MessagePack and packed-row content negotiation."""
+
+    def test_msgpack_request_and_response(self, client):
+        """Test a single calculation sent and answered as MessagePack."""
+        # Arrange
+        payload = {"gross": 8000, "contract": "employment"}
+
+        # Act
+        response = client.post("/api/calculate", content=msgpack.packb(payload),
+                               headers={"Content-Type": wire.MSGPACK, "Accept": wire.MSGPACK})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"] == wire.MSGPACK
+        assert msgpack.unpackb(response.content) == client.post("/api/calculate", json=payload).json()
+
+    def test_msgpack_validation_errors_match_json(self, client):
+        """Test that invalid MessagePack bodies get the same 422 as JSON."""
+        # Arrange
+        payload = {"gross": -100, "contract": "employment"}
+
+        # Act
+        response = client.post("/api/calculate", content=msgpack.packb(payload),
+                               headers={"Content-Type": wire.MSGPACK})
+
+        # Assert
+        assert response.status_code == 422
+        assert response.json() == client.post("/api/calculate", json=payload).json()
+
+    def test_bulk_rows_round_trip(self, client):
+        """Test that packed rows in give packed results matching JSON results."""
+        # Arrange
+        batch = [Inputs(gross=3000 + 250 * i, contract=list(ContractType)[i % 3], age=20 + i)
+                 for i in range(9)]
+        body = b"".join(wire.pack_inputs(inputs) for inputs in batch)
+
+        # Act
+        response = client.post("/api/calculate/bulk", content=body,
+                               headers={"Content-Type": wire.ROWS, "Accept": wire.ROWS})
+
+        # Assert
+        assert response.status_code == 200
+        items = [{**inputs.__dict__, "contract": inputs.contract.value} for inputs in batch]
+        expected = client.post("/api/calculate/bulk", json={"items": items}).json()
+        assert [r.__dict__ for r in wire.unpack_results(response.content)] == expected
+
+    def test_truncated_rows_are_rejected(self, client):
+        """Test that a body that is not a whole number of rows fails with 422."""
+        # Arrange
+        body = wire.pack_inputs(Inputs(gross=5000, contract=ContractType.WORK))[:-1]
+
+        # Act
+        response = client.post("/api/calculate/bulk", content=body, headers={"Content-Type": wire.ROWS})
+
+        # Assert
+        assert response.status_code == 422
+
+    def test_oversized_rows_body_is_rejected_before_unpacking(self, client, monkeypatch):
+        """Test that the row limit is enforced from the body length alone."""
+        # Arrange
+        row = wire.pack_inputs(Inputs(gross=5000, contract=ContractType.WORK))
+        body = row * (main.BULK_MAX_ITEMS + 1)
+
+        def unexpected(body):
+            raise AssertionError("rows were unpacked")
+
+        monkeypatch.setattr(wire, "unpack_rows", unexpected)
+
+        # Act
+        response = client.post("/api/calculate/bulk", content=body, headers={"Content-Type": wire.ROWS})
+
+        # Assert
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["msg"] == f"at most {main.BULK_MAX_ITEMS} rows"
+
+    def test_unsupported_content_type_returns_415(self, client):
+        """Test that an unknown request encoding is refused."""
+        # Arrange & Act
+        response = client.post("/api/calculate", content=b"gross=5000",
+                               headers={"Content-Type": "text/plain"})
+
+        # Assert
+        assert response.status_code == 415
+
+
+class TestAdminProfileEndpoint:
+    """Integration tests for the admin-only profiling endpoint."""
+
+    def test_profile_endpoint_is_hidden_without_admin_token(self, client, monkeypatch):
+        """Test that the endpoint does not exist when no admin token is configured."""
+        # Arrange
+        monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+
+        # Act
+        response = client.post("/admin/profile?seconds=0.01")
+
+        # Assert
+        assert response.status_code == 404
+
+    def test_profile_endpoint_rejects_wrong_token(self, client, monkeypatch):
+        """Test that a wrong bearer token is refused."""
+        # Arrange
+        monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+
+        # Act
+        response = client.post("/admin/profile?seconds=0.01", headers={"Authorization": "Bearer nope"})
+
+        # Assert
+        assert response.status_code == 401
+
+    def test_profile_endpoint_returns_collapsed_stacks(self, client, monkeypatch):
+        """Test that an admin gets a flamegraph-ready collapsed profile."""
+        # Arrange
+        monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+
+        # Act
+        response = client.post("/admin/profile?seconds=0.05&rate=100&include_idle=true",
+                               headers={"Authorization": "Bearer secret"})
+
+        # Assert
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        lines = response.text.splitlines()
+        assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    def test_profile_endpoint_returns_json_report(self, client, monkeypatch):
+        """Test that the JSON format includes per-function calculations timings."""
+        # Arrange
+        monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+
+        # Act
+        response = client.post("/admin/profile?seconds=0.05&format=json",
+                               headers={"Authorization": "Bearer secret"})
+
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert data["ticks"] > 0
+        assert "calculations" in data and "stacks" in data
+
+    def test_profile_endpoint_rejects_non_finite_parameters(self, client, monkeypatch):
+        """Test that nan and inf are refused instead of starting an unbounded session."""
+        # Arrange
+        monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+        headers = {"Authorization": "Bearer secret"}
+        queries = ["seconds=nan", "seconds=inf", "rate=nan", "rate=inf", "rate=-inf"]
+
+        # Act
+        statuses = [client.post(f"/admin/profile?{query}", headers=headers).status_code for query in queries]
+        after = client.post("/admin/profile?seconds=0.01", headers=headers)
+
+        # Assert
+        assert statuses == [422] * len(queries)
+        assert after.status_code == 200
+
+
+class TestAdmissionMetrics:
+    """Integration tests for the admission-control metrics endpoint."""
+
+    def test_metrics_report_both_lanes(self, client):
+        """Test that queue depth and counters are exposed for each lane."""
+        # Arrange
+        client.post("/api/calculate", json={"gross": 5000, "contract": "work"})
+
+        # Act
+        response = client.get("/metrics/admission")
+
+        # Assert
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"interactive", "bulk"}
+        assert data["interactive"]["admitted"] >= 1
+        assert data["interactive"]["active"] == 0
+        assert data["bulk"]["queued"] == 0
+
+
+class TestLoadTestHarness:
+    """Integration tests for the load-testing harness."""
+
+    def test_generated_payloads_are_accepted_by_api(self, client):
+        """Test that every generated payload passes request validation."""
+        # Arrange
+        generator = PayloadGenerator(seed=42)
+
+        # Act
+        statuses = {client.post("/api/calculate", json=generator.payload()).status_code
+                    for _ in range(200)}
+
+        # Assert
+        assert statuses == {200}
+
+    def test_run_load_reports_throughput_and_percentiles(self):
+        """Test that a short in-process run produces a report per step."""
+        # Arrange
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                return await run_load(http, PayloadGenerator(seed=1), [1, 2], 0.2, warmup=0)
+
+        # Act
+        steps = asyncio.run(run())
+
+        # Assert
+        assert [step.concurrency for step in steps] == [1, 2]
+        assert all(step.requests > 0 and step.errors == 0 for step in steps)
+        assert steps[0].latency_ms["p50"] <= steps[0].latency_ms["p99"]
@@ -1,3 +1,14 @@
+import asyncio
+import csv
+import gzip
+import json
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
 import pytest
 from app.calculations import (
     calculate_net_salary,
@@ -8,7 +19,18 @@ from app.calculations import (
     EmploymentCalculator,
     MandateCalculator,
     WorkCalculator,
+    calculate_many,
+    set_result_cache,
 )
+from app.cache import ResultCache, cache_key
+from app import calculations
+from app.shared import SharedResultCache, SharedSegment, inputs_digest
+from app.admission import AdmissionController, AdmissionMiddleware, Lane, LaneRejected
+from app import wire
+from app.profiler import ProfilerBusy, SamplingProfiler
+from app import cli
+from app.compression import make_stream, negotiate_encoding
+from tools.fuzz import ENGINES, REFERENCE, available_engines, benchmark, fuzz
 
 
 def almost_equal(actual, expected, epsilon=0.01):
@@ -325,3 +347,735 @@ class TestBackwardCompatibility:
         assert hasattr(result, 'health')
         assert hasattr(result, 'tax_deductible_costs')
         assert hasattr(result, 'pit')
+
+
+class TestResultCache:
+    """Unit tests for the persistent result cache."""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = ResultCache(tmp_path / "results.sqlite")
+        set_result_cache(cache)
+        yield cache
+        set_result_cache(None)
+        cache.close()
+
+    def test_cache_key_ignores_numeric_representation(self):
+        """Test that equal inputs given as int or float share one key."""
+        # Arrange
+        as_int = Inputs(gross=5000, contract=ContractType.WORK, tax_deductible_percent=1)
+        as_float = Inputs(gross=5000.0, contract=ContractType.WORK, tax_deductible_percent=1.0)
+
+        # Act & Assert
+        assert cache_key(as_int) == cache_key(as_float)
+
+    def test_cache_key_depends_on_rules_version(self):
+        """Test that changing the rule-set version changes the key."""
+        # Arrange
+        inputs = Inputs(gross=5000, contract=ContractType.EMPLOYMENT)
+
+        # Act & Assert
+        assert cache_key(inputs, "2024.1") != cache_key(inputs, "2025.1")
+
+    def test_cached_result_matches_computed_result(self, cache):
+        """Test that a cache hit returns the same result as a fresh calculation."""
+        # Arrange
+        inputs = Inputs(gross=7000, contract=ContractType.MANDATE, age=24, is_student=True)
+
+        # Act
+        first = calculate_net_salary(inputs)
+        second = calculate_net_salary(inputs)
+
+        # Assert
+        assert first == second
+        stats = cache.stats()
+        assert stats.hits == 1
+        assert stats.misses == 1
+        assert stats.hit_rate == 0.5
+
+    def test_results_survive_reopening_the_store(self, cache, tmp_path):
+        """Test that results persist across cache instances on the same file."""
+        # Arrange
+        inputs = Inputs(gross=4000, contract=ContractType.WORK)
+        expected = calculate_net_salary(inputs)
+
+        # Act
+        reopened = ResultCache(tmp_path / "results.sqlite")
+        cached = reopened.get(inputs)
+        reopened.close()
+
+        # Assert
+        assert cached == expected
+
+    def test_calculate_many_uses_bulk_lookup(self, cache):
+        """Test that batch calculation fills the cache and reuses it."""
+        # Arrange
+        batch = [Inputs(gross=1000 + i, contract=ContractType.EMPLOYMENT) for i in range(10)]
+
+        # Act
+        first = calculate_many(batch)
+        second = calculate_many(batch)
+
+        # Assert
+        assert first == second
+        assert cache.stats().entries == 10
+        assert cache.stats().hits == 10
+
+    def test_cache_evicts_when_over_size_limit(self, tmp_path):
+        """Test that the store stays within its configured size."""
+        # Arrange
+        cache = ResultCache(tmp_path / "small.sqlite", max_bytes=1000)
+        batch = [Inputs(gross=1000 + i, contract=ContractType.WORK) for i in range(100)]
+
+        # Act
+        for inputs in batch:
+            cache.put(inputs, calculate_net_salary(inputs))
+        stats = cache.stats()
+        cache.close()
+
+        # Assert
+        assert stats.size_bytes <= 1000
+        assert stats.evictions > 0
+
+    def test_running_size_total_matches_stored_rows(self, tmp_path):
+        """Test that the tracked byte total follows inserts, overwrites and evictions."""
+        # Arrange
+        cache = ResultCache(tmp_path / "total.sqlite", max_bytes=3000)
+        batch = [Inputs(gross=2000 + i, contract=ContractType.MANDATE) for i in range(80)]
+
+        # Act
+        cache.put_many([(inputs, calculate_net_salary(inputs)) for inputs in batch])
+        cache.put_many([(inputs, calculate_net_salary(inputs)) for inputs in batch[-10:]])
+        stats = cache.stats()
+        actual = cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        cache.close()
+
+        # Assert
+        assert stats.size_bytes == actual
+        assert actual <= 3000
+
+    def test_recent_hits_do_not_write(self, cache):
+        """Test that hits inside the touch interval leave the LRU timestamp alone."""
+        # Arrange
+        inputs = Inputs(gross=4200, contract=ContractType.WORK)
+        calculate_net_salary(inputs)
+        changes_before = cache._conn.total_changes
+
+        # Act
+        cache.get_many([inputs] * 5)
+
+        # Assert
+        assert cache._conn.total_changes == changes_before
+
+    def test_cache_key_depends_on_rule_values(self):
+        """Test that editing a rate without bumping the version still changes the key."""
+        # Arrange
+        inputs = Inputs(gross=5000, contract=ContractType.EMPLOYMENT)
+        rules = calculations.current_rules()
+        edited = {**rules, "HEALTH_PERCENTAGE": rules["HEALTH_PERCENTAGE"] + 0.01}
+
+        # Act & Assert
+        assert cache_key(inputs, "2024.1", rules) != cache_key(inputs, "2024.1", edited)
+
+    def test_put_is_skipped_while_another_writer_holds_the_lock(self, cache, tmp_path):
+        """Test that a busy store drops the write quickly instead of blocking the caller."""
+        # Arrange
+        inputs = Inputs(gross=5100, contract=ContractType.WORK)
+        other = sqlite3.connect(tmp_path / "results.sqlite", isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+
+        # Act
+        started = time.perf_counter()
+        result = calculate_net_salary(inputs)
+        elapsed = time.perf_counter() - started
+        other.execute("ROLLBACK")
+        other.close()
+
+        # Assert
+        assert result == calculations._compute(inputs)
+        assert elapsed < 1.0
+        assert cache.stats().skipped_writes == 1
+        assert cache.get(inputs) is None
+
+
+class TestDifferentialFuzzer:
+    """Unit tests for the differential fuzzer across calculation engines."""
+
+    def test_all_engines_agree_with_reference(self):
+        """Test that no engine disagrees with the reference calculators."""
+        # Arrange & Act
+        failures = fuzz(iterations=500, seed=2024)
+
+        # Assert
+        assert failures == []
+
+    def test_mismatch_is_reported_with_minimal_inputs(self):
+        """Test that a faulty engine is caught and its inputs are shrunk."""
+        # Arrange
+        def broken(batch):
+            results = ENGINES[REFERENCE](batch)
+            for inputs, result in zip(batch, results):
+                if inputs.age == 26:
+                    result.pit = 0.0
+            return results
+
+        engines = {REFERENCE: ENGINES[REFERENCE], "broken": broken}
+
+        # Act
+        failures = fuzz(iterations=300, seed=7, engines=engines, max_failures=1)
+
+        # Assert
+        assert len(failures) == 1
+        assert failures[0]["engines"] == ["broken"]
+        minimal = failures[0]["inputs"]
+        assert minimal["age"] == 26
+        assert minimal["creative_50"] is False
+        assert minimal["tax_deductible_percent"] is None
+
+    def test_throughput_mode_reports_every_engine(self):
+        """Test that the benchmark mode measures each available engine."""
+        # Arrange
+        engines = available_engines()
+
+        # Act
+        report = benchmark(engines, size=50, repeat=1)
+
+        # Assert
+        assert set(report) == set(engines)
+        assert all(entry["calculations_per_s"] > 0 for entry in report.values())
+        assert report["sqlite_cache"]["path"] == "cache_hit"
+        assert report[REFERENCE]["path"] == "compute"
+
+    def test_tools_run_as_plain_scripts(self):
+        """Test that the tools import the app package when run by path."""
+        # Arrange
+        tools = Path(__file__).resolve().parent.parent / "tools"
+
+        # Act
+        completed = subprocess.run([sys.executable, "fuzz.py", "--iterations", "5", "--seed", "1"],
+                                   cwd=tools, capture_output=True, text=True)
+
+        # Assert
+        assert completed.returncode == 0, completed.stderr
+
+
+class TestCompression:
+    """Unit tests for Accept-Encoding negotiation and streamed compression."""
+
+    def test_negotiation_prefers_brotli_when_available(self):
+        """Test that brotli wins a tie with gzip when both are supported."""
+        # Arrange & Act
+        encoding = negotiate_encoding("gzip, br", available=("br", "gzip"))
+
+        # Assert
+        assert encoding == "br"
+
+    def test_negotiation_respects_quality_values(self):
+        """Test that q-values, including q=0, are honoured."""
+        # Arrange & Act & Assert
+        assert negotiate_encoding("br;q=0.5, gzip", available=("br", "gzip")) == "gzip"
+        assert negotiate_encoding("gzip;q=0", available=("gzip",)) is None
+        assert negotiate_encoding("identity", available=("gzip",)) is None
+        assert negotiate_encoding("*", available=("gzip",)) == "gzip"
+
+    def test_incremental_gzip_round_trips(self):
+        """Test that chunk-by-chunk gzip output decompresses to the original body."""
+        # Arrange
+        chunks = [b"[", b'{"net":1.0}', b',{"net":2.0}' * 50, b"]"]
+        stream = make_stream("gzip")
+
+        # Act
+        body = b"".join(stream.compress(chunk) for chunk in chunks[:-1]) + stream.finish(chunks[-1])
+
+        # Assert
+        assert gzip.decompress(body) == b"".join(chunks)
+
+
+class TestSharedMemoryCache:
+    """Unit tests for the shared-memory rule table and result cache."""
+
+    @pytest.fixture
+    def segment(self):
+        rules, version = calculations.current_rules(), calculations.RULES_VERSION
+        segment = SharedSegment.create(slots=256)
+        yield segment
+        calculations.load_rules(rules, version)
+        set_result_cache(None)
+        segment.close()
+        segment.unlink()
+
+    def test_attached_worker_sees_results_written_by_another(self, segment):
+        """Test that a second attachment reads results without recomputing."""
+        # Arrange
+        inputs = Inputs(gross=6500, contract=ContractType.EMPLOYMENT)
+        writer = SharedResultCache(segment)
+        set_result_cache(writer)
+        expected = calculate_net_salary(inputs)
+        other = SharedSegment.attach(segment.name)
+
+        # Act
+        cached = SharedResultCache(other).get(inputs)
+        other.close()
+
+        # Assert
+        assert cached == expected
+
+    def test_segment_holds_the_rule_table(self, segment):
+        """Test that the segment is initialised with the current rules."""
+        # Arrange & Act
+        version, rules = segment.rules()
+
+        # Assert
+        assert version == calculations.RULES_VERSION
+        assert rules == calculations.current_rules()
+
+    def test_publishing_rules_invalidates_cached_results(self, segment):
+        """Test that a rules reload makes every worker drop stale results."""
+        # Arrange
+        inputs = Inputs(gross=10000, contract=ContractType.EMPLOYMENT)
+        cache = SharedResultCache(segment)
+        set_result_cache(cache)
+        before = calculate_net_salary(inputs)
+        rules = calculations.current_rules()
+        rules["SOCIAL_EMPLOYEE_PERCENTAGE"] = 0.2
+
+        # Act
+        segment.publish_rules(rules, "test-reload")
+        stale = cache.get(inputs)
+        after = calculate_net_salary(inputs)
+
+        # Assert
+        assert stale is None
+        assert calculations.RULES_VERSION == "test-reload"
+        assert after.social_total == 2000.0
+        assert after != before
+
+    def test_torn_slot_is_treated_as_miss(self, segment):
+        """Test that a slot with a bad checksum is never returned."""
+        # Arrange
+        inputs = Inputs(gross=3000, contract=ContractType.WORK)
+        cache = SharedResultCache(segment)
+        cache.put(inputs, calculate_net_salary(inputs))
+        # Flip a byte inside the stored net value.
+        segment.buf[segment.slot_offset(inputs_digest(inputs)) + 72] ^= 0xFF
+
+        # Act
+        result = cache.get(inputs)
+
+        # Assert
+        assert result is None
+
+    def test_leftover_segment_does_not_override_code_rules(self, segment):
+        """Test that attaching to an old segment republishes the rules from code."""
+        # Arrange
+        inputs = Inputs(gross=10000, contract=ContractType.EMPLOYMENT)
+        SharedResultCache(segment).put(inputs, calculate_net_salary(inputs))
+        rules = calculations.current_rules()
+        rules["SOCIAL_EMPLOYEE_PERCENTAGE"] = 0.15
+        calculations.load_rules(rules, "2099.1")
+
+        # Act
+        attached = SharedSegment.attach_or_create(segment.name)
+        cache = SharedResultCache(attached)
+        version, segment_rules = attached.rules()
+        cached = cache.get(inputs)
+        attached.close()
+
+        # Assert
+        assert calculations.RULES_VERSION == "2099.1"
+        assert calculations.SOCIAL_EMPLOYEE_PERCENTAGE == 0.15
+        assert version == "2099.1"
+        assert segment_rules["SOCIAL_EMPLOYEE_PERCENTAGE"] == 0.15
+        assert cached is None
+
+    def test_publishing_changed_rules_requires_version_bump(self, segment):
+        """Test that rules cannot change under an unchanged version string."""
+        # Arrange
+        rules = calculations.current_rules()
+        rules["HEALTH_PERCENTAGE"] = 0.1
+
+        # Act & Assert
+        with pytest.raises(ValueError):
+            segment.publish_rules(rules, calculations.RULES_VERSION)
+
+    def test_result_computed_before_reload_is_not_served_after_it(self, segment):
+        """Test that a put racing a rules reload cannot leave a stale live slot."""
+        # Arrange
+        inputs = Inputs(gross=10000, contract=ContractType.EMPLOYMENT)
+        cache = SharedResultCache(segment)
+        assert cache.get(inputs) is None
+        stale = calculate_net_salary(inputs)
+        rules = calculations.current_rules()
+        rules["SOCIAL_EMPLOYEE_PERCENTAGE"] = 0.2
+        segment.publish_rules(rules, "test-race")
+        other = threading.Thread(target=cache.get, args=(Inputs(gross=1, contract=ContractType.WORK),))
+        other.start()
+        other.join()
+
+        # Act
+        cache.put(inputs, stale)
+        cached = cache.get(inputs)
+
+        # Assert
+        assert stale.social_total == 1371.0
+        assert cached is None
+
+    def test_result_racing_a_reload_is_not_persisted_in_the_fallback(self, segment, tmp_path):
+        """Test that the persistent fallback never stores a pre-reload result under the new rules."""
+        # Arrange
+        inputs = Inputs(gross=10000, contract=ContractType.EMPLOYMENT)
+        fallback = ResultCache(tmp_path / "fallback.sqlite")
+        cache = SharedResultCache(segment, fallback=fallback)
+        set_result_cache(cache)
+        assert cache.get(inputs) is None
+        stale = calculations._compute(inputs)
+        rules = calculations.current_rules()
+        rules["SOCIAL_EMPLOYEE_PERCENTAGE"] = 0.2
+        segment.publish_rules(rules, "2025.1")
+        other = threading.Thread(target=cache.get, args=(Inputs(gross=1, contract=ContractType.WORK),))
+        other.start()
+        other.join()
+
+        # Act
+        cache.put(inputs, stale)
+        served = calculate_net_salary(inputs)
+        reopened = ResultCache(tmp_path / "fallback.sqlite").get(inputs)
+        fallback.close()
+
+        # Assert
+        assert stale.social_total == 1371.0
+        assert served.social_total == 2000.0
+        assert reopened == served
+
+
+class TestAdmissionControl:
+    """Unit tests for admission lanes and their rejection behaviour."""
+
+    def test_lane_rejects_with_429_when_queue_is_full(self):
+        """Test that a full queue is rejected immediately with 429."""
+        # Arrange
+        lane = Lane("bulk", max_concurrency=1, max_queue=1, queue_timeout=5.0, retry_after=10)
+
+        async def scenario():
+            await lane.acquire()
+            queued = asyncio.ensure_future(lane.acquire())
+            await asyncio.sleep(0)
+            with pytest.raises(LaneRejected) as rejected:
+                await lane.acquire()
+            lane.release()
+            await queued
+            return rejected.value
+
+        # Act
+        rejected = asyncio.run(scenario())
+
+        # Assert
+        assert rejected.status_code == 429
+        assert lane.stats().rejected_full == 1
+        assert lane.stats().active == 1
+        assert lane.stats().queued == 0
+
+    def test_lane_rejects_with_503_when_queue_wait_times_out(self):
+        """Test that a request waiting too long in the queue gets 503."""
+        # Arrange
+        lane = Lane("interactive", max_concurrency=1, max_queue=4, queue_timeout=0.01, retry_after=1)
+
+        async def scenario():
+            await lane.acquire()
+            with pytest.raises(LaneRejected) as rejected:
+                await lane.acquire()
+            return rejected.value
+
+        # Act
+        rejected = asyncio.run(scenario())
+
+        # Assert
+        assert rejected.status_code == 503
+        assert lane.stats().rejected_timeout == 1
+        assert lane.stats().queued == 0
+
+    def test_bulk_saturation_does_not_block_interactive_lane(self):
+        """Test that interactive requests are admitted while the bulk lane is full."""
+        # Arrange
+        controller = AdmissionController(
+            interactive=Lane("interactive", 2, 2, 1.0, 1),
+            bulk=Lane("bulk", 1, 0, 1.0, 10),
+        )
+
+        async def scenario():
+            await controller.classify("/api/calculate/bulk").acquire()
+            with pytest.raises(LaneRejected):
+                await controller.classify("/api/calculate/bulk").acquire()
+            await controller.classify("/api/calculate").acquire()
+
+        # Act
+        asyncio.run(scenario())
+        snapshot = controller.snapshot()
+
+        # Assert
+        assert snapshot["bulk"].rejected_full == 1
+        assert snapshot["interactive"].admitted == 1
+        assert controller.classify("/health") is None
+
+    def test_middleware_sends_retry_after_on_rejection(self):
+        """Test that a rejected request gets a Retry-After header."""
+        # Arrange
+        controller = AdmissionController(
+            interactive=Lane("interactive", 0, 0, 1.0, 3),
+            bulk=Lane("bulk", 0, 0, 1.0, 10),
+        )
+        sent = []
+
+        async def app(scope, receive, send):
+            raise AssertionError("request should not reach the app")
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = AdmissionMiddleware(app, controller)
+
+        # Act
+        asyncio.run(middleware({"type": "http", "path": "/api/calculate"}, None, send))
+
+        # Assert
+        assert sent[0]["status"] == 429
+        assert (b"retry-after", b"3") in sent[0]["headers"]
+
+
+class TestWireFormats:
+    """Unit tests for content negotiation and the binary wire formats."""
+
+    def test_rows_round_trip_preserves_inputs(self):
+        """Test that packed rows decode back to the same inputs."""
+        # Arrange
+        batch = [
+            Inputs(gross=4000, contract=ContractType.MANDATE, age=22, is_student=True),
+            Inputs(gross=9000.5, contract=ContractType.EMPLOYMENT, tax_deductible_fixed=300.0),
+            Inputs(gross=3000, contract=ContractType.WORK, tax_deductible_percent=0.0, creative_50=True),
+        ]
+
+        # Act
+        decoded = wire.unpack_rows(b"".join(wire.pack_inputs(inputs) for inputs in batch))
+
+        # Assert
+        assert decoded == batch
+
+    def test_rows_are_validated_like_the_json_schema(self):
+        """Test that out-of-range rows are rejected with their index."""
+        # Arrange
+        good = wire.pack_inputs(Inputs(gross=5000, contract=ContractType.WORK))
+        bad = wire.pack_inputs(Inputs(gross=5000, contract=ContractType.WORK, tax_deductible_percent=1.5))
+
+        # Act
+        with pytest.raises(wire.RowError) as error:
+            wire.unpack_rows(good + bad)
+
+        # Assert
+        assert error.value.row == 1
+        assert error.value.field == "tax_deductible_percent"
+
+    def test_result_rows_round_trip(self):
+        """Test that packed results decode to identical values."""
+        # Arrange
+        results = calculate_many([Inputs(gross=7000 + i, contract=ContractType.EMPLOYMENT) for i in range(5)])
+
+        # Act
+        decoded = wire.unpack_results(wire.pack_results(results))
+
+        # Assert
+        assert decoded == results
+
+    def test_json_is_the_default_response_format(self):
+        """Test that JSON is chosen when nothing better is acceptable."""
+        # Arrange & Act & Assert
+        assert wire.response_format(None) == wire.JSON
+        assert wire.response_format("*/*") == wire.JSON
+        assert wire.response_format(wire.ROWS) == wire.JSON
+        assert wire.response_format(wire.ROWS, bulk=True) == wire.ROWS
+
+    def test_unknown_content_type_is_rejected(self):
+        """Test that an unsupported request body type raises."""
+        # Arrange & Act & Assert
+        with pytest.raises(wire.UnsupportedMediaType):
+            wire.request_format("text/csv")
+
+
+class TestSamplingProfiler:
+    """Unit tests for the in-process sampling profiler."""
+
+    def test_profile_attributes_time_to_calculations_functions(self):
+        """Test that samples taken during calculations show up per function."""
+        # Arrange
+        stop = threading.Event()
+
+        def work():
+            while not stop.is_set():
+                calculate_net_salary(Inputs(gross=5000, contract=ContractType.MANDATE))
+
+        worker = threading.Thread(target=work)
+        worker.start()
+
+        # Act
+        try:
+            profile = SamplingProfiler().profile(seconds=0.3, rate_hz=200)
+        finally:
+            stop.set()
+            worker.join()
+
+        # Assert
+        functions = {entry["function"] for entry in profile.calculations_timings()}
+        assert "calculate_net_salary" in functions
+        assert profile.ticks <= 0.3 * 200 + 1
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in profile.collapsed().splitlines())
+
+    def test_only_one_profile_runs_at_a_time(self):
+        """Test that a second concurrent session is refused instead of queued."""
+        # Arrange
+        profiler = SamplingProfiler()
+        profiler._session.acquire()
+
+        # Act & Assert
+        try:
+            with pytest.raises(ProfilerBusy):
+                profiler.profile(seconds=0.01)
+        finally:
+            profiler._session.release()
+
+    def test_non_finite_parameters_are_rejected(self):
+        """Test that nan or inf never reaches the sampling loop."""
+        # Arrange
+        profiler = SamplingProfiler()
+
+        # Act & Assert
+        for seconds, rate_hz in ((float("nan"), 100.0), (float("inf"), 100.0),
+                                 (0.01, float("nan")), (0.01, float("inf"))):
+            with pytest.raises(ValueError):
+                profiler.profile(seconds=seconds, rate_hz=rate_hz)
+        assert not profiler.running
+
+
+class TestOfflineRunner:
+    """Unit tests for the offline multi-core CLI payroll runner."""
+
+    @pytest.fixture
+    def input_csv(self, tmp_path):
+        path = tmp_path / "employees.csv"
+        lines = ["id,gross,contract,age,is_student,creative_50"]
+        lines += [f"{i},{3000 + 37 * i},{('employment', 'mandate', 'work')[i % 3]},{20 + i % 40},"
+                  f"{'true' if i % 2 else ''},{'true' if i % 5 == 0 else 'false'}" for i in range(250)]
+        lines.append("250,-10,work,30,,")
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        return path
+
+    def test_results_are_written_in_input_order(self, input_csv, tmp_path):
+        """Test that every row comes out in order with results matching the engine."""
+        # Arrange
+        output = tmp_path / "out.csv"
+
+        # Act
+        summary = cli.run(input_csv, output, workers=2, chunk_rows=16)
+
+        # Assert
+        with output.open(newline="") as handle:
+            rows = list(csv.DictReader(handle))
+        assert summary["rows"] == 251
+        assert [row["id"] for row in rows] == [str(i) for i in range(251)]
+        expected = calculate_net_salary(Inputs(gross=3000 + 37 * 7, contract=ContractType.MANDATE,
+                                               age=27, is_student=True))
+        assert float(rows[7]["net"]) == expected.net
+        assert rows[250]["net"] == ""
+        assert rows[250]["error"].startswith("gross")
+        assert not (tmp_path / "out.csv.ckpt").exists()
+
+    def test_resume_from_checkpoint_matches_clean_run(self, input_csv, tmp_path):
+        """Test that an interrupted run resumes without duplicating or losing rows."""
+        # Arrange
+        clean = tmp_path / "clean.jsonl"
+        cli.run(input_csv, clean, workers=1, chunk_rows=50)
+        lines = clean.read_bytes().splitlines(keepends=True)
+        partial = tmp_path / "partial.jsonl"
+        committed = b"".join(lines[:100])
+        # Half a chunk was written after the last checkpoint before the "crash".
+        partial.write_bytes(committed + b"".join(lines[100:125]))
+        checkpoint = cli.Checkpoint(tmp_path / "partial.jsonl.ckpt", input_csv)
+        # Header plus the first 100 data lines.
+        offset = len(b"".join(input_csv.read_bytes().splitlines(keepends=True)[:101]))
+        checkpoint.save(rows_done=100, input_offset=offset, output_bytes=len(committed))
+
+        # Act
+        summary = cli.run(input_csv, partial, workers=2, chunk_rows=50)
+
+        # Assert
+        assert summary["rows"] == 251
+        assert partial.read_bytes() == clean.read_bytes()
+
+    def test_unreadable_jsonl_lines_become_error_rows(self, tmp_path):
+        """Test that malformed or non-object JSONL lines get error rows instead of aborting the run."""
+        # Arrange
+        source = tmp_path / "employees.jsonl"
+        source.write_text('{"id": 0, "gross": 5000, "contract": "work", "age": 30}\n'
+                          '{"id": 1, "gross": \n'
+                          '[1, 2]\n'
+                          '{"id": 3, "gross": 6000, "contract": "mandate", "age": 40}\n', encoding="utf-8")
+        output = tmp_path / "out.jsonl"
+
+        # Act
+        summary = cli.run(source, output, workers=2, chunk_rows=2)
+
+        # Assert
+        rows = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+        assert summary["rows"] == 4
+        assert [row["error"] for row in rows[::3]] == ["", ""]
+        assert [row["id"] for row in rows[::3]] == [0, 3]
+        assert rows[1]["error"].startswith("invalid JSON")
+        assert rows[2]["error"] == "row must be a JSON object, not list"
+        assert rows[1]["net"] is None and rows[2]["net"] is None
+
+    def test_csv_columns_from_jsonl_survive_a_bad_first_row_and_a_resume(self, tmp_path):
+        """Test that CSV columns are the union of JSONL keys and stay fixed when a run resumes."""
+        # Arrange
+        source = tmp_path / "employees.jsonl"
+        lines = ['{"gross": ']
+        lines += [json.dumps({"gross": 4000 + i, "contract": "work", "id": i, **({"team": "a"} if i == 7 else {})})
+                  for i in range(1, 12)]
+        source.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        clean = tmp_path / "clean.csv"
+        cli.run(source, clean, workers=2, chunk_rows=4)
+        header, *body = clean.read_bytes().splitlines(keepends=True)
+        partial = tmp_path / "partial.csv"
+        committed = header + b"".join(body[:4])
+        partial.write_bytes(committed + body[4])
+        checkpoint = cli.Checkpoint(tmp_path / "partial.csv.ckpt", source)
+        offset = len("".join(line + "\n" for line in lines[:4]).encode("utf-8"))
+        columns = tuple(header.decode("utf-8").strip().split(","))
+        checkpoint.save(rows_done=4, input_offset=offset, output_bytes=len(committed), columns=columns)
+
+        # Act
+        cli.run(source, partial, workers=2, chunk_rows=4)
+
+        # Assert
+        with clean.open(newline="") as handle:
+            rows = list(csv.DictReader(handle))
+        assert columns[:4] == ("gross", "contract", "id", "team")
+        assert rows[0]["error"].startswith("invalid JSON")
+        assert [row["id"] for row in rows[1:]] == [str(i) for i in range(1, 12)]
+        assert rows[7]["team"] == "a"
+        assert partial.read_bytes() == clean.read_bytes()
+
+    def test_quoted_newlines_do_not_split_csv_records(self, tmp_path):
+        """Test that a quoted cell spanning lines stays one record across chunk boundaries."""
+        # Arrange
+        source = tmp_path / "employees.csv"
+        source.write_text('id,note,gross,contract\n1,"two\nlines",5000,work\n2,plain,6000,work\n'
+                          '3,"say ""hi""\nthere",7000,mandate\n', encoding="utf-8")
+        output = tmp_path / "out.csv"
+
+        # Act
+        summary = cli.run(source, output, workers=2, chunk_rows=1)
+
+        # Assert
+        with output.open(newline="") as handle:
+            rows = list(csv.DictReader(handle))
+        assert summary["rows"] == 3
+        assert [row["note"] for row in rows] == ["two\nlines", "plain", 'say "hi"\nthere']
+        assert all(row["error"] == "" for row in rows)
@@ -0,0 +1,77 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+if not __package__:
+    # Run as a script (python tools/compression_bench.py): make the app package importable.
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.compression import make_stream, supported_encodings
+from app.main import BULK_CHUNK_ROWS, _stream_bulk
+from tools.fuzz import InputsGenerator
+
+
+DEFAULT_ROWS = (1, 10, 100, 1000, 10000)
+
+
+def bulk_body_chunks(rows: int, seed: int = 0) -> list[bytes]:
+    inputs_list = InputsGenerator(seed).batch(rows)
+    return list(_stream_bulk(inputs_list))
+
+
+def measure(chunks: list[bytes], encoding: str, level: int, repeat: int) -> dict[str, float]:
+    raw_size = sum(len(chunk) for chunk in chunks)
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        stream = make_stream(encoding, gzip_level=level, brotli_quality=level)
+        size = sum(len(stream.compress(chunk)) for chunk in chunks[:-1])
+        size += len(stream.finish(chunks[-1]))
+        best = min(best, time.perf_counter() - started)
+    return {
+        "bytes": size,
+        "ratio": round(raw_size / size, 2) if size else 0.0,
+        "cpu_ms": round(best * 1000, 3),
+        "mb_per_s": round(raw_size / best / 1e6, 1) if best else 0.0,
+    }
+
+
+def run(rows_list: list[int], levels: dict[str, list[int]], repeat: int = 5) -> list[dict]:
+    report = []
+    for rows in rows_list:
+        chunks = bulk_body_chunks(rows)
+        entry = {"rows": rows, "identity_bytes": sum(len(chunk) for chunk in chunks), "encodings": {}}
+        for encoding, encoding_levels in levels.items():
+            for level in encoding_levels:
+                entry["encodings"][f"{encoding}-{level}"] = measure(chunks, encoding, level, repeat)
+        report.append(entry)
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Bytes-on-the-wire versus CPU for compressed bulk responses.")
+    parser.add_argument("--rows", default=",".join(map(str, DEFAULT_ROWS)),
+                        help="comma-separated bulk sizes to measure")
+    parser.add_argument("--gzip-levels", default="1,6,9")
+    parser.add_argument("--brotli-qualities", default="1,4,11")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    levels = {"gzip": [int(v) for v in args.gzip_levels.split(",")]}
+    if "br" in supported_encodings():
+        levels["br"] = [int(v) for v in args.brotli_qualities.split(",")]
+
+    report = {
+        "chunk_rows": BULK_CHUNK_ROWS,
+        "results": run([int(v) for v in args.rows.split(",")], levels, args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
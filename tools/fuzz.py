@@ -0,0 +1,279 @@
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import asdict, fields, replace
+from pathlib import Path
+from typing import Callable
+
+if not __package__:
+    # Run as a script (python tools/fuzz.py): make the app package importable.
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import calculations as logic
+from app.calculations import ContractType, Inputs, Result
+from app.cache import ResultCache
+from app.shared import SharedResultCache, SharedSegment
+
+
+Engine = Callable[[list[Inputs]], list[Result]]
+
+
+def _reference(batch: list[Inputs]) -> list[Result]:
+    return [logic.CalculatorFactory.create_calculator(inputs).calculate() for inputs in batch]
+
+
+def _public(batch: list[Inputs]) -> list[Result]:
+    return [logic.calculate_net_salary(inputs) for inputs in batch]
+
+
+def _batch(batch: list[Inputs]) -> list[Result]:
+    return logic.calculate_many(batch)
+
+
+class _CachedEngine:
+
+    def __init__(self, cache=None):
+        if cache is None:
+            self._dir = tempfile.TemporaryDirectory()
+            cache = ResultCache(Path(self._dir.name) / "fuzz.sqlite")
+        self.cache = cache
+
+    @contextmanager
+    def _installed(self):
+        previous = logic.get_result_cache()
+        logic.set_result_cache(self.cache)
+        try:
+            yield
+        finally:
+            logic.set_result_cache(previous)
+
+    def warm(self, batch: list[Inputs]) -> None:
+        with self._installed():
+            logic.calculate_many(batch)
+
+    def hits(self, batch: list[Inputs]) -> list[Result]:
+        with self._installed():
+            return [logic.calculate_net_salary(inputs) for inputs in batch]
+
+    def __call__(self, batch: list[Inputs]) -> list[Result]:
+        # The second pass is served from the store, so both paths are compared.
+        self.warm(batch)
+        return self.hits(batch)
+
+
+def _shared_memory_engine() -> _CachedEngine:
+    segment = SharedSegment.create(slots=4096)
+    engine = _CachedEngine(SharedResultCache(segment))
+    weakref.finalize(engine, _release_segment, segment)
+    return engine
+
+
+def _release_segment(segment: SharedSegment) -> None:
+    segment.close()
+    segment.unlink()
+
+
+REFERENCE = "reference"
+ENGINES: dict[str, Engine] = {
+    REFERENCE: _reference,
+    "calculate_net_salary": _public,
+    "calculate_many": _batch,
+}
+ENGINE_FACTORIES: dict[str, Callable[[], Engine]] = {
+    "sqlite_cache": _CachedEngine,
+    "shared_memory": _shared_memory_engine,
+}
+
+
+def register_engine(name: str, engine: Engine) -> None:
+    ENGINES[name] = engine
+
+
+def available_engines() -> dict[str, Engine]:
+    engines = dict(ENGINES)
+    for name, factory in ENGINE_FACTORIES.items():
+        engines[name] = factory()
+    return engines
+
+
+class InputsGenerator:
+
+    def __init__(self, seed: int | None = None):
+        self.rng = random.Random(seed)
+
+    def gross(self) -> float:
+        rng = self.rng
+        roll = rng.random()
+        if roll < 0.1:
+            return rng.choice((0.01, 0.5, 1.0, 100.0, 250.0, 250.01, 1000.0))
+        if roll < 0.2:
+            return float(rng.randint(1, 1_000_000))
+        if roll < 0.3:
+            # Values whose rounding sits on a half-cent boundary.
+            return round(rng.uniform(1, 50_000), 2) + 0.005
+        return round(rng.lognormvariate(8.85, 0.8), 2) or 0.01
+
+    def age(self) -> int:
+        rng = self.rng
+        if rng.random() < 0.4:
+            return rng.choice((24, 25, 26, 27))
+        return rng.randint(0, 120)
+
+    def inputs(self) -> Inputs:
+        rng = self.rng
+        percent_choices = (None, None, 0.0, 1.0, 0, 1, 0.2, 0.5, round(rng.random(), 4))
+        fixed_choices = (None, None, 0.0, 250.0, round(rng.uniform(0, 20_000), 2))
+        return Inputs(
+            gross=self.gross(),
+            contract=rng.choice(list(ContractType)),
+            age=self.age(),
+            is_student=rng.random() < 0.5,
+            tax_deductible_fixed=rng.choice(fixed_choices),
+            tax_deductible_percent=rng.choice(percent_choices),
+            creative_50=rng.random() < 0.3,
+            youth_tax_relief=rng.random() < 0.5,
+            include_social_for_mandate=rng.random() < 0.7,
+        )
+
+    def batch(self, size: int) -> list[Inputs]:
+        return [self.inputs() for _ in range(size)]
+
+
+def _results_equal(left: Result, right: Result, tolerance: float) -> bool:
+    return all(abs(getattr(left, f.name) - getattr(right, f.name)) <= tolerance for f in fields(Result))
+
+
+def find_mismatches(inputs: Inputs, engines: dict[str, Engine], tolerance: float = 0.0) -> list[str]:
+    expected = engines[REFERENCE]([inputs])[0]
+    return [name for name, engine in engines.items()
+            if name != REFERENCE and not _results_equal(engine([inputs])[0], expected, tolerance)]
+
+
+def _complexity(value: float) -> tuple[int, float]:
+    return len(repr(value)), value
+
+
+def _shrink_candidates(inputs: Inputs):
+    defaults = Inputs(gross=inputs.gross, contract=inputs.contract)
+    for f in fields(Inputs):
+        if f.name in ("gross", "contract"):
+            continue
+        if getattr(inputs, f.name) != getattr(defaults, f.name):
+            yield replace(inputs, **{f.name: getattr(defaults, f.name)})
+    for contract in ContractType:
+        if list(ContractType).index(contract) < list(ContractType).index(inputs.contract):
+            yield replace(inputs, contract=contract)
+    for gross in (1000.0, float(round(inputs.gross)), float(round(inputs.gross, -2)), inputs.gross / 2):
+        if gross > 0 and _complexity(gross) < _complexity(inputs.gross):
+            yield replace(inputs, gross=gross)
+    if inputs.age not in (25, 26, 30):
+        for age in (30, 26, 25):
+            yield replace(inputs, age=age)
+
+
+def shrink(inputs: Inputs, still_fails: Callable[[Inputs], bool], max_steps: int = 500) -> Inputs:
+    current = inputs
+    for _ in range(max_steps):
+        for candidate in _shrink_candidates(current):
+            if still_fails(candidate):
+                current = candidate
+                break
+        else:
+            return current
+    return current
+
+
+def fuzz(iterations: int, seed: int | None = None, engines: dict[str, Engine] | None = None,
+         tolerance: float = 0.0, max_failures: int = 10) -> list[dict]:
+    engines = engines if engines is not None else available_engines()
+    generator = InputsGenerator(seed)
+    failures: list[dict] = []
+    seen: set[tuple] = set()
+    for _ in range(iterations):
+        inputs = generator.inputs()
+        mismatched = find_mismatches(inputs, engines, tolerance)
+        if not mismatched:
+            continue
+        minimal = shrink(inputs, lambda candidate: bool(find_mismatches(candidate, engines, tolerance)))
+        signature = tuple(sorted(asdict(minimal).items()))
+        if signature in seen:
+            continue
+        seen.add(signature)
+        culprits = find_mismatches(minimal, engines, tolerance)
+        failures.append({
+            "inputs": _jsonable(asdict(minimal)),
+            "engines": culprits,
+            "expected": asdict(engines[REFERENCE]([minimal])[0]),
+            "actual": {name: asdict(engines[name]([minimal])[0]) for name in culprits},
+        })
+        if len(failures) >= max_failures:
+            break
+    return failures
+
+
+def benchmark(engines: dict[str, Engine], size: int, seed: int | None = None,
+              repeat: int = 3) -> dict[str, dict[str, float]]:
+    batch = InputsGenerator(seed).batch(size)
+    report = {}
+    for name, engine in engines.items():
+        run, path = engine, "compute"
+        if isinstance(engine, _CachedEngine):
+            # Fill the store untimed, then time one pass that is all hits.
+            engine.warm(batch)
+            run, path = engine.hits, "cache_hit"
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(batch)
+            best = min(best, time.perf_counter() - started)
+        report[name] = {
+            "path": path,
+            "calculations_per_s": round(size / best, 1),
+            "us_per_calculation": round(best / size * 1e6, 3),
+        }
+    return report
+
+
+def _jsonable(data: dict) -> dict:
+    return {key: value.value if isinstance(value, ContractType) else value for key, value in data.items()}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Differential fuzzer and micro-benchmark for the salary calculation engines.")
+    parser.add_argument("--iterations", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--engines", help="comma-separated subset of engines to run")
+    parser.add_argument("--tolerance", type=float, default=0.0,
+                        help="allowed absolute difference per result field")
+    parser.add_argument("--max-failures", type=int, default=10)
+    parser.add_argument("--throughput", action="store_true",
+                        help="benchmark each engine instead of fuzzing")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+
+    engines = available_engines()
+    if args.engines:
+        wanted = {REFERENCE, *args.engines.split(",")}
+        unknown = wanted - set(engines)
+        if unknown:
+            parser.error(f"unknown engines: {', '.join(sorted(unknown))}")
+        engines = {name: engine for name, engine in engines.items() if name in wanted}
+
+    if args.throughput:
+        print(json.dumps(benchmark(engines, args.batch_size, args.seed), indent=2))
+        return 0
+
+    failures = fuzz(args.iterations, args.seed, engines, args.tolerance, args.max_failures)
+    print(json.dumps({"iterations": args.iterations, "engines": sorted(engines),
+                      "failures": failures}, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
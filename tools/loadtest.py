@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import httpx
+
+
+ROOT = Path(__file__).resolve().parent.parent
+if not __package__:
+    # Run as a script (python tools/loadtest.py): --in-process imports the app package.
+    sys.path.insert(0, str(ROOT))
+DEFAULT_MIX = {"employment": 0.6, "mandate": 0.3, "work": 0.1}
+DEFAULT_STEPS = (1, 2, 4, 8, 16, 32)
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        contract, _, weight = part.partition("=")
+        mix[contract.strip()] = float(weight)
+    return mix
+
+
+class PayloadGenerator:
+
+    def __init__(self, mix: dict[str, float] = DEFAULT_MIX, seed: int | None = None):
+        self.contracts = list(mix)
+        self.weights = [mix[c] for c in self.contracts]
+        self.rng = random.Random(seed)
+
+    def payload(self) -> dict:
+        rng = self.rng
+        contract = rng.choices(self.contracts, self.weights)[0]
+        # Polish gross salaries are roughly log-normal with a median near 7000 PLN.
+        gross = round(min(max(rng.lognormvariate(8.85, 0.45), 500.0), 100000.0), 2)
+        age = int(min(max(rng.gauss(38, 11), 18), 70))
+        payload = {"gross": gross, "contract": contract, "age": age}
+
+        if age < 26:
+            payload["youth_tax_relief"] = rng.random() < 0.7
+            payload["is_student"] = rng.random() < 0.5
+        if contract == "employment" and rng.random() < 0.1:
+            payload["tax_deductible_fixed"] = 300.0
+        if contract in ("mandate", "work"):
+            payload["creative_50"] = rng.random() < 0.15
+            if rng.random() < 0.1:
+                payload["tax_deductible_percent"] = rng.choice((0.0, 0.2, 0.5, 1.0))
+        if contract == "mandate":
+            payload["include_social_for_mandate"] = rng.random() < 0.9
+        return payload
+
+
+@dataclass
+class StepReport:
+    concurrency: int
+    duration_s: float
+    requests: int
+    errors: int
+    rejected: int
+    error_rate: float
+    throughput_rps: float
+    calculations_per_s: float
+    latency_ms: dict[str, float]
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies: list[float]) -> dict[str, float]:
+    ordered = sorted(latencies)
+    summary = {name: percentile(ordered, q) * 1000 for name, q in
+               (("p50", 0.50), ("p90", 0.90), ("p99", 0.99), ("p999", 0.999))}
+    summary["max"] = ordered[-1] * 1000 if ordered else 0.0
+    return {name: round(value, 3) for name, value in summary.items()}
+
+
+async def run_step(client: httpx.AsyncClient, generator: PayloadGenerator,
+                   concurrency: int, duration: float, path: str, bulk_size: int = 0) -> StepReport:
+    latencies: list[float] = []
+    errors = 0
+    rejected = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors, rejected
+        while time.perf_counter() < deadline:
+            if bulk_size:
+                payload = {"items": [generator.payload() for _ in range(bulk_size)]}
+            else:
+                payload = generator.payload()
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=payload)
+                ok = response.status_code == 200
+                if response.status_code in (429, 503):
+                    rejected += 1
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    requests = len(latencies)
+    return StepReport(
+        concurrency=concurrency,
+        duration_s=round(elapsed, 3),
+        requests=requests,
+        errors=errors,
+        rejected=rejected,
+        error_rate=round(errors / requests, 6) if requests else 0.0,
+        throughput_rps=round(requests / elapsed, 2) if elapsed else 0.0,
+        calculations_per_s=round((requests - errors) * max(bulk_size, 1) / elapsed, 2) if elapsed else 0.0,
+        latency_ms=summarize_latencies(latencies),
+    )
+
+
+def find_knee(steps: list[StepReport], factor: float) -> int | None:
+    if not steps:
+        return None
+    baseline = steps[0].latency_ms["p99"]
+    for step in steps[1:]:
+        if step.latency_ms["p99"] > baseline * factor:
+            return step.concurrency
+    return None
+
+
+async def run_load(client: httpx.AsyncClient, generator: PayloadGenerator, steps: list[int],
+                   duration: float, path: str = "/api/calculate", warmup: float = 1.0,
+                   bulk_size: int = 0) -> list[StepReport]:
+    if warmup > 0:
+        await run_step(client, generator, 1, warmup, path, bulk_size)
+    return [await run_step(client, generator, c, duration, path, bulk_size) for c in steps]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int = 1) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited before becoming ready")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn did not become ready within 30 s")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the salary calculator API on localhost.")
+    parser.add_argument("--url", help="use an already running server instead of starting uvicorn")
+    parser.add_argument("--in-process", action="store_true",
+                        help="drive the ASGI app in-process, without sockets")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers to start")
+    parser.add_argument("--steps", default=",".join(map(str, DEFAULT_STEPS)),
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per step")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="contract mix, e.g. employment=0.6,mandate=0.3,work=0.1")
+    parser.add_argument("--path", help="endpoint to drive (default depends on --bulk-size)")
+    parser.add_argument("--bulk-size", type=int, default=0,
+                        help="rows per request; >0 drives /api/calculate/bulk")
+    parser.add_argument("--accept-encoding", default="identity",
+                        help="Accept-Encoding header sent with every request")
+    parser.add_argument("--background-bulk", type=int, default=0,
+                        help="concurrent bulk clients saturating the bulk lane during the run")
+    parser.add_argument("--background-bulk-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--knee-factor", type=float, default=3.0,
+                        help="p99 growth over the first step that marks saturation")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    steps = [int(s) for s in args.steps.split(",")]
+    path = args.path or ("/api/calculate/bulk" if args.bulk_size else "/api/calculate")
+    headers = {"Accept-Encoding": args.accept_encoding}
+    generator = PayloadGenerator(args.mix, args.seed)
+    server = None
+    if args.in_process:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                                   headers=headers)
+        target = "in-process"
+    else:
+        if args.url:
+            target = args.url
+        else:
+            port = _free_port()
+            server = start_server(port, args.workers)
+            target = f"http://127.0.0.1:{port}"
+        connections = max(steps) + args.background_bulk
+        limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        client = httpx.AsyncClient(base_url=target, limits=limits, timeout=30.0, headers=headers)
+
+    async def run():
+        async with client:
+            background = None
+            if args.background_bulk:
+                background = asyncio.create_task(run_step(
+                    client, PayloadGenerator(args.mix, args.seed), args.background_bulk,
+                    1.0 + len(steps) * args.duration, "/api/calculate/bulk",
+                    bulk_size=args.background_bulk_size,
+                ))
+            reports = await run_load(client, generator, steps, args.duration, path,
+                                     bulk_size=args.bulk_size)
+            return reports, (await background if background is not None else None)
+
+    try:
+        reports, background = asyncio.run(run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "target": target,
+        "path": path,
+        "bulk_size": args.bulk_size,
+        "workers": args.workers if server is not None else None,
+        "mix": args.mix,
+        "steps": [asdict(r) for r in reports],
+        "background_bulk": asdict(background) if background is not None else None,
+        "peak_throughput_rps": max((r.throughput_rps for r in reports), default=0.0),
+        "p99_knee_concurrency": find_knee(reports, args.knee_factor),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
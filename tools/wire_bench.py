@@ -0,0 +1,82 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+if not __package__:
+    # Run as a script (python tools/wire_bench.py): make the app package importable.
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import calculations as logic
+from app import wire
+from app.calculations import Inputs
+from app.schemas import BulkCalcRequest
+from tools.fuzz import InputsGenerator
+
+
+DEFAULT_ROWS = (1, 100, 10000)
+
+
+def _request_dict(inputs: Inputs) -> dict:
+    return {**inputs.__dict__, "contract": inputs.contract.value}
+
+
+def _best_time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def measure(rows: int, fmt: str, repeat: int) -> dict[str, float]:
+    inputs_list = InputsGenerator(0).batch(rows)
+    results = logic.calculate_many(inputs_list)
+    if fmt == wire.ROWS:
+        encode_request = lambda: b"".join(wire.pack_inputs(inputs) for inputs in inputs_list)
+        decode_request = wire.unpack_rows
+        encode_response = lambda: wire.pack_results(results)
+        decode_response = wire.unpack_results
+    else:
+        request = {"items": [_request_dict(inputs) for inputs in inputs_list]}
+        response = [result.__dict__ for result in results]
+        encode_request = lambda: wire.encode(request, fmt)
+        # Include validation, as the rows decoder also validates and builds Inputs.
+        decode_request = lambda body: [item.to_inputs() for item in
+                                       BulkCalcRequest.parse_obj(wire.decode(body, fmt)).items]
+        encode_response = lambda: wire.encode(response, fmt)
+        decode_response = lambda body: wire.decode(body, fmt)
+
+    request_body = encode_request()
+    response_body = encode_response()
+    return {
+        "request_bytes": len(request_body),
+        "response_bytes": len(response_body),
+        "request_encode_us": round(_best_time(encode_request, repeat) * 1e6, 1),
+        "request_decode_us": round(_best_time(lambda: decode_request(request_body), repeat) * 1e6, 1),
+        "response_encode_us": round(_best_time(encode_response, repeat) * 1e6, 1),
+        "response_decode_us": round(_best_time(lambda: decode_response(response_body), repeat) * 1e6, 1),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Payload size and encode/decode cost of the wire formats against JSON.")
+    parser.add_argument("--rows", default=",".join(map(str, DEFAULT_ROWS)))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    report = []
+    for rows in (int(v) for v in args.rows.split(",")):
+        report.append({
+            "rows": rows,
+            "formats": {fmt: measure(rows, fmt, args.repeat) for fmt in wire.available_formats(bulk=True)},
+        })
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())